@@ -0,0 +1,227 @@
+r"""
+Runs the import / analysis pipeline headlessly, i.e. what the 001_GenerateData
+and 002_PickleZipData notebooks do, without Jupyter or the plotting libraries.
+
+Each manifest group is run in its own process, as the costimulation (scripts/)
+and pulse train (pulse_trains/scripts/) code use the same flat module names.
+The groups are:
+ - costim: FILES, written to the cache, data.pickle, the runs/ store and
+   costim_results.csv / .npz
+ - single: OPT_ONLY_FILES, ELEC_ONLY_FILES and FAKE_COSTIM_FILES, written to
+   single_stimulus.csv
+ - pulse_trains: the pulse train FILES, written to pulse_train_results.csv
+
+Usage, from the repository root:
+
+    python batch.py --data /Data --pulse-data /PulseData --out output --workers 8
+    python batch.py --group costim --profile
+
+--data sets the costim and single stimulus data directory and --pulse-data the
+pulse train one. Each defaults to BASE_PATH in its definitions.py, relative to
+the directory its notebooks are run from.
+
+Exits with status 1 if any file could not be analysed.
+
+data.pickle refers to the classes by their module (file_data.FileData), so
+`scripts` must be on the path to unpickle it. Set OUTPUT_DIR in
+003_RestoreDatasFromPickle to the output directory to restore it in the notebooks.
+"""
+
+import argparse
+import csv
+import gzip
+import os
+import pickle
+import subprocess
+import sys
+import time
+from typing import List
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# the directory holding each group's (flat) modules, the shared sgn package is in ROOT_DIR
+GROUP_PATHS = {
+    "costim": os.path.join(ROOT_DIR, "scripts"),
+    "single": os.path.join(ROOT_DIR, "scripts"),
+    "pulse_trains": os.path.join(ROOT_DIR, "pulse_trains", "scripts"),
+}
+
+# the directory each group's notebooks are run from, which a relative BASE_PATH
+# in its definitions.py is relative to
+NOTEBOOK_DIRS = {
+    "costim": ROOT_DIR,
+    "single": ROOT_DIR,
+    "pulse_trains": os.path.join(ROOT_DIR, "pulse_trains"),
+}
+
+# the option overriding each group's BASE_PATH, as the two datasets are stored separately
+DATA_OPTIONS = {
+    "costim": "data",
+    "single": "data",
+    "pulse_trains": "pulse_data",
+}
+
+# the single stimulus manifests in files.py, and how each is analysed (see single_stimulus.KINDS)
+SINGLE_STIMULUS_FILES = {
+    "optical": "OPT_ONLY_FILES",
+    "electrical": "ELEC_ONLY_FILES",
+    "fake_costim": "FAKE_COSTIM_FILES",
+}
+
+
+def _report_errors(results) -> int:
+    """Prints the error of each result that failed to load, returning the number of failures"""
+    failed = [x for x in results if x.error is not None]
+    for result in failed:
+        print(f"Unable to load {result.meta[0]}\n{result.error}")
+    return len(failed)
+
+
+def _run_costim(args) -> int:
+    # pylint: disable=import-outside-toplevel
+    import files
+    from file_data import FileDataCache, generate_df_and_write_csv, load_all
+    from run_store import write_run_store
+
+    cache = None if args.no_cache else FileDataCache(os.path.join(args.out, "cache"))
+    results = load_all(
+        files.FILES,
+        workers=args.workers,
+        cache=cache,
+        trace_dir=args.trace_dir,
+        lazy=args.lazy)
+
+    failures = _report_errors(results)
+    datas = [x.data for x in results if x.error is None]
+
+    with gzip.GzipFile(os.path.join(args.out, "data.pickle"), "w") as f:
+        pickle.dump(datas, f, pickle.HIGHEST_PROTOCOL)
+
+    write_run_store(datas, os.path.join(args.out, "runs"))
+    if datas:
+        generate_df_and_write_csv(datas, os.path.join(args.out, "costim_results.csv"))
+
+    print(f"Analysed {sum(len(x.runs) for x in datas)} runs from {len(datas)} files")
+    return failures
+
+
+def _run_single(args) -> int:
+    # pylint: disable=import-outside-toplevel
+    import files
+    from single_stimulus import COLUMNS, describe_all
+
+    failures = 0
+    rows = []
+    for kind, name in SINGLE_STIMULUS_FILES.items():
+        results = describe_all(kind, getattr(files, name), args.workers)
+        failures += _report_errors(results)
+        rows.extend(row for x in results if x.error is None for row in x.data)
+
+    with open(os.path.join(args.out, "single_stimulus.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Described {len(rows)} single stimulus peaks")
+    return failures
+
+
+def _run_pulse_trains(args) -> int:
+    # pylint: disable=import-outside-toplevel
+    import files
+    from file_data import generate_df_and_write_csv, load_all
+
+    results = load_all(files.FILES, workers=args.workers)
+
+    failures = _report_errors(results)
+    datas = [x.data for x in results if x.error is None]
+    if datas:
+        generate_df_and_write_csv(datas, os.path.join(args.out, "pulse_train_results.csv"))
+
+    print(f"Analysed {sum(len(x.runs) for x in datas)} pulse train runs from {len(datas)} files")
+    return failures
+
+
+GROUPS = {
+    "costim": _run_costim,
+    "single": _run_single,
+    "pulse_trains": _run_pulse_trains,
+}
+
+
+def run_group(name: str, args) -> int:
+    """
+    Runs the named group in this process, which must only be used for this group.
+    Returns the number of files which failed to load
+    """
+    sys.path.insert(0, GROUP_PATHS[name])
+
+    # pylint: disable=import-outside-toplevel
+    import definitions as d
+    from sgn import profiling
+
+    data = getattr(args, DATA_OPTIONS[name])
+    d.BASE_PATH = data if data is not None else os.path.join(NOTEBOOK_DIRS[name], d.BASE_PATH)
+    if args.profile:
+        profiling.enable()
+
+    failures = GROUPS[name](args)
+
+    if args.profile:
+        print(profiling.format_report())
+
+    return failures
+
+
+def main(argv: List[str] = None) -> int:
+    """Runs the pipeline from the command line, returning the exit status"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--group", action="append", choices=sorted(GROUPS),
+                        help="the manifest group to run, can be repeated (default: all)")
+    parser.add_argument("--data", help="the directory holding the costim and single stimulus "
+                        "axograph files (default: BASE_PATH in scripts/definitions.py)")
+    parser.add_argument("--pulse-data", help="the directory holding the pulse train axograph files "
+                        "(default: BASE_PATH in pulse_trains/scripts/definitions.py)")
+    parser.add_argument("--out", default=".", help="the directory to write the outputs to (default: .)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="the number of worker processes (default: one per CPU)")
+    parser.add_argument("--no-cache", action="store_true", help="re-analyse every costim file")
+    parser.add_argument("--trace-dir", help="memory map the costim traces from this directory")
+    parser.add_argument("--lazy", action="store_true",
+                        help="only calculate costim time constants when first accessed")
+    parser.add_argument("--profile", action="store_true", help="print the time taken by each stage")
+    parser.add_argument("--child", choices=sorted(GROUPS), help=argparse.SUPPRESS)
+    argv = sys.argv[1:] if argv is None else argv
+    args = parser.parse_args(argv)
+
+    if args.data is not None:
+        args.data = os.path.abspath(args.data)
+    if args.pulse_data is not None:
+        args.pulse_data = os.path.abspath(args.pulse_data)
+    args.out = os.path.abspath(args.out)
+
+    # the cached FileData refer to their trace files by this path, so it must
+    # not depend on the directory batch.py is run from
+    if args.trace_dir is not None:
+        args.trace_dir = os.path.abspath(args.trace_dir)
+    os.makedirs(args.out, exist_ok=True)
+
+    if args.child:
+        return 1 if run_group(args.child, args) else 0
+
+    status = 0
+    for name in args.group or list(GROUPS):
+        start = time.perf_counter()
+        print(f"Running {name}")
+
+        # the child is given the same options, which it resolves the same way
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name] + argv)
+        status = status or child.returncode
+
+        print(f"Finished {name} in {time.perf_counter() - start:.1f}s")
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
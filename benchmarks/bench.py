@@ -0,0 +1,359 @@
+r"""
+Benchmarks the import / analysis pipeline on synthetic data (see synthetic.py).
+
+Each suite runs in its own process, as the costimulation (scripts/) and
+pulse train (pulse_trains/scripts/) code use the same flat module names,
+and so that the peak RSS of each suite is measured separately. Reports
+runs / sec and per run latency for each stage, and the peak RSS of each
+suite, and compares them to a stored baseline.
+
+Usage, from the repository root:
+
+    python benchmarks/bench.py                  # run and compare to the baseline
+    python benchmarks/bench.py --save-baseline  # run and store a new baseline
+
+Exits with status 1 if any stage is slower (or any suite uses more memory)
+than the baseline by more than the tolerance.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from typing import Callable, Dict, List
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# the directories holding each suite's (flat) modules
+SUITE_PATHS = {
+    "costim": os.path.join(ROOT_DIR, "scripts"),
+    "pulse_train": os.path.join(ROOT_DIR, "pulse_trains", "scripts"),
+}
+
+# the modules a worker process imports to analyse each suite's files
+SUITE_MODULES = {
+    "costim": ["file_data", "run_store"],
+    "pulse_train": ["file_data"],
+}
+
+# pulse train files as per pulse_trains/scripts/files.py, with 2 runs per current level
+PULSE_TRAIN_FILES = [
+    ["synthetic_20hz.axgd", 13, 2500, 10, 40, -10, 130, 3, 15, 2200, 220, 1],
+    ["synthetic_50hz.axgd", 13, 2500, 10, 10, -10, 130, 3, 15, 2200, 220, 1],
+]
+
+
+def _peak_rss_mb() -> float:
+    """The peak resident set size of this process in MB, or None if unavailable"""
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / (1024. * 1024.) if sys.platform == "darwin" else peak / 1024.
+
+
+def _time_stage(func: Callable[[], int], repeat: int) -> Dict[str, float]:
+    """
+    Times func, which returns the number of runs it processed, over the
+    given number of repeats
+    """
+    times = []
+    for _ in range(repeat):
+        # the pipeline prints progress, which is not being measured
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            count = func()
+            times.append(time.perf_counter() - start)
+
+    median = statistics.median(times)
+    return {
+        "runs": count,
+        "median_s": median,
+        "min_s": min(times),
+        "runs_per_s": count / median if median > 0 else float("inf"),
+        "ms_per_run": 1000. * median / count if count else 0.,
+        "best_ms_per_run": 1000. * min(times) / count if count else 0.,
+    }
+
+
+def _import_modules(name: str) -> int:
+    """
+    Imports the suite's analysis modules in a new interpreter, as a worker
+    process would. The interpreter start up time is included.
+    """
+    paths = [SUITE_PATHS[name], ROOT_DIR, os.environ.get("PYTHONPATH", "")]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(x for x in paths if x))
+    subprocess.run(
+        [sys.executable, "-c", "; ".join(f"import {x}" for x in SUITE_MODULES[name])],
+        env=env,
+        check=True)
+    return 1
+
+
+def _costim_suite(groups: int, repeat: int) -> Dict[str, dict]:
+    # pylint: disable=import-outside-toplevel
+    import definitions as d
+    from file_data import FileData
+    from sgn.costimulation_run import CostimulationRun
+    from sgn.sweeps import SweepReader
+    from sgn.time_constants import TimeConstants
+    import synthetic
+
+    # one file per protocol
+    files = [
+        ([f"synthetic_{x.protocol_id}.axgd", 10, 1800, 1900, 180, 200, True, x.protocol_id, x.protocol_id],
+         synthetic.costim_sweeps(x, groups, seed=x.protocol_id))
+        for x in d.PARAMS
+    ]
+
+    def load(lazy: bool = False) -> List[FileData]:
+        return [
+            FileData(meta, lazy=lazy, sweeps=SweepReader(meta[d.PATH], columns, names))
+            for meta, (names, columns) in files
+        ]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = load()
+
+    runs = [run for file in loaded for run in file.runs]
+    windows = [
+        (data[file.protocol.get_data_slice(x)], file.protocol)
+        for file in loaded for data in (run.data for run in file.runs) for x in file.protocol.stim_type
+    ]
+
+    def construct_runs() -> int:
+        # the per run analysis, rather than the batch analysis used by FileData
+        for file, (_, (_, columns)) in zip(loaded, files):
+            sweeps = columns[1::file.protocol.column_count]
+            for run, sweep in zip(file.runs, sweeps):
+                CostimulationRun(
+                    file, file.protocol, sweep, run.offset,
+                    file.elec_thresh, file.opt_thresh, file.cell)
+        return len(runs)
+
+    def describe_peaks() -> int:
+        for data, _ in windows:
+            TimeConstants.describe_peaks(data)
+        return len(runs)
+
+    def get_derivative() -> int:
+        for data, protocol in windows:
+            TimeConstants.get_derivative(data, protocol.sample_period, 25, 1000. / 50000.)
+        return len(runs)
+
+    def to_df() -> int:
+        for file in loaded:
+            file.to_df()
+        return len(runs)
+
+    return {
+        "import": _time_stage(lambda: _import_modules("costim"), repeat),
+        "file_data": _time_stage(lambda: sum(len(x.runs) for x in load()), repeat),
+        "file_data_lazy": _time_stage(lambda: sum(len(x.runs) for x in load(True)), repeat),
+        "costimulation_run": _time_stage(construct_runs, repeat),
+        "describe_peaks": _time_stage(describe_peaks, repeat),
+        "get_derivative": _time_stage(get_derivative, repeat),
+        "to_df": _time_stage(to_df, repeat),
+    }
+
+
+def _pulse_train_suite(groups: int, repeat: int) -> Dict[str, dict]:
+    # pylint: disable=import-outside-toplevel
+    import definitions as d
+    from file_data import FileData
+    from sgn.sweeps import SweepReader
+    import synthetic
+
+    files = [
+        (meta, synthetic.pulse_train_sweeps(groups, meta[d.O_W], meta[d.O_I], meta[d.LVL], seed=i))
+        for i, meta in enumerate(PULSE_TRAIN_FILES)
+    ]
+
+    def load() -> List[FileData]:
+        return [
+            FileData(meta, sweeps=SweepReader(meta[d.PATH], columns, names))
+            for meta, (names, columns) in files
+        ]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = load()
+
+    runs = [run for file in loaded for run in file.runs]
+
+    def get_peaks() -> int:
+        for run in runs:
+            run.get_peaks()
+        return len(runs)
+
+    def to_df() -> int:
+        for file in loaded:
+            file.to_df()
+        return len(runs)
+
+    return {
+        "import": _time_stage(lambda: _import_modules("pulse_train"), repeat),
+        "file_data": _time_stage(lambda: sum(len(x.runs) for x in load()), repeat),
+        "get_peaks": _time_stage(get_peaks, repeat),
+        "to_df": _time_stage(to_df, repeat),
+    }
+
+
+SUITES = {
+    "costim": _costim_suite,
+    "pulse_train": _pulse_train_suite,
+}
+
+
+def run_suite(name: str, groups: int, repeat: int) -> dict:
+    """Runs the named suite in this process, which must only be used for this suite"""
+    sys.path[:0] = [SUITE_PATHS[name], ROOT_DIR, BENCH_DIR]
+
+    # e.g. vector strengths of runs without any peaks
+    warnings.simplefilter("ignore")
+
+    stages = SUITES[name](groups, repeat)
+    return {"stages": stages, "peak_rss_mb": _peak_rss_mb()}
+
+
+def _run_suite_process(name: str, groups: int, repeat: int) -> dict:
+    """Runs the named suite in a new process, returning its results"""
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "result.json")
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", name,
+             "--groups", str(groups), "--repeat", str(repeat), "--out", out],
+            check=True)
+
+        with open(out, "r") as f:
+            return json.load(f)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Compares the results to the baseline, returning a description of
+    each regression
+    """
+    regressions = []
+    for suite, result in results["suites"].items():
+        base = baseline["suites"].get(suite)
+        if base is None:
+            continue
+
+        for stage, timing in result["stages"].items():
+            base_timing = base["stages"].get(stage)
+            if base_timing is None:
+                continue
+
+            # the best of the repeats is the least affected by other load on the machine
+            ratio = timing["best_ms_per_run"] / base_timing["best_ms_per_run"]
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    f"{suite}.{stage}: {timing['best_ms_per_run']:.3f} ms / run is "
+                    f"{ratio:.2f}x the baseline {base_timing['best_ms_per_run']:.3f} ms / run")
+
+        if result["peak_rss_mb"] and base["peak_rss_mb"]:
+            ratio = result["peak_rss_mb"] / base["peak_rss_mb"]
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    f"{suite}: peak RSS {result['peak_rss_mb']:.0f} MB is "
+                    f"{ratio:.2f}x the baseline {base['peak_rss_mb']:.0f} MB")
+
+    return regressions
+
+
+def print_results(results: dict, baseline: dict = None):
+    """Prints a table of the results, with the change from the baseline if given"""
+    print(f"{'stage':<32}{'runs/s':>12}{'ms/run':>12}{'vs baseline':>14}")
+    for suite, result in results["suites"].items():
+        base = {} if baseline is None else baseline["suites"].get(suite, {}).get("stages", {})
+        for stage, timing in result["stages"].items():
+            change = ""
+            if stage in base:
+                change = f"{timing['best_ms_per_run'] / base[stage]['best_ms_per_run']:.2f}x"
+            print(f"{suite + '.' + stage:<32}{timing['runs_per_s']:>12.1f}"
+                  f"{timing['ms_per_run']:>12.3f}{change:>14}")
+
+        if result["peak_rss_mb"] is not None:
+            print(f"{suite + ' peak RSS (MB)':<32}{result['peak_rss_mb']:>24.0f}")
+
+
+def main(argv: List[str] = None) -> int:
+    """Runs the benchmarks from the command line, returning the exit status"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES),
+                        help="the suite to run, can be repeated (default: all)")
+    parser.add_argument("--groups", type=int, default=36,
+                        help="the number of runs in each synthetic file (default: 36)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="the number of times each stage is timed (default: 5)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="the stored baseline")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="the allowed slow down before a stage is a regression (default: 0.25)")
+    parser.add_argument("--child", choices=sorted(SUITES), help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        with open(args.out, "w") as f:
+            json.dump(run_suite(args.child, args.groups, args.repeat), f)
+        return 0
+
+    results = {
+        "config": {
+            "groups": args.groups,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "suites": {
+            x: _run_suite_process(x, args.groups, args.repeat) for x in (args.suite or sorted(SUITES))
+        }
+    }
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print("No baseline to compare to, use --save-baseline to store one")
+        return 0
+
+    if baseline["config"]["groups"] != args.groups:
+        print(f"Warning: the baseline was run with --groups {baseline['config']['groups']}")
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+r"""
+Generates synthetic axograph-like sweeps, so the import / analysis pipeline
+can be benchmarked without the recorded data.
+
+Sweeps are membrane voltages in V (before junction potential correction)
+sampled at the protocol frequency, with a resting potential, recording
+noise, and either an action potential or a subthreshold response at each
+stimulus onset.
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# The (rise, decay) time constants (s) and amplitude (V) of each response shape
+AP_SHAPE = (0.0002, 0.0015, 0.11)
+ELECTRICAL_SHAPE = (0.0003, 0.003, 0.006)
+OPTICAL_SHAPE = (0.0015, 0.008, 0.008)
+
+# the duration (s) of each response which is drawn
+RESPONSE_DURATION = 0.05
+
+RESTING_POTENTIAL = -0.06
+RESTING_SPREAD = 0.002
+NOISE = 0.0002
+
+# The delay (s) from the stimulus onset to the start of an action potential
+AP_DELAY = 0.001
+
+
+def _add_response(
+        sweep: np.ndarray,
+        frequency: int,
+        onset: float,
+        shape: Tuple[float, float, float]
+):
+    """
+    Adds a double exponential response to the sweep, starting at the onset (s)
+    and scaled so the peak is the amplitude
+    """
+    (rise, decay, amplitude) = shape
+    start = int(round(onset * frequency))
+    stop = min(start + int(RESPONSE_DURATION * frequency), len(sweep))
+    if start >= stop:
+        return
+
+    t = np.arange(stop - start) / frequency
+    t_peak = rise * decay * np.log(decay / rise) / (decay - rise)
+    norm = np.exp(-t_peak / decay) - np.exp(-t_peak / rise)
+    sweep[start:stop] += amplitude * (np.exp(-t / decay) - np.exp(-t / rise)) / norm
+
+
+def _base_sweep(rng: np.random.RandomState, length: int) -> np.ndarray:
+    """A resting membrane potential with recording noise"""
+    rest = RESTING_POTENTIAL + rng.normal(0, RESTING_SPREAD)
+    return rest + rng.normal(0, NOISE, length)
+
+
+def _stimulus_column(length: int, frequency: int, onsets: Sequence[float], width: float) -> np.ndarray:
+    """A stimulus command column, with a pulse of the given width (s) at each onset"""
+    column = np.zeros(length)
+    for onset in onsets:
+        start = int(round(onset * frequency))
+        column[start:start + int(width * frequency)] = 1.
+    return column
+
+
+def costim_sweeps(
+        protocol: "Protocol",
+        groups: int,
+        seed: int = 0,
+        ap_probability: Tuple[float, float, float] = (0.5, 0.2, 0.1),
+        dtype: np.dtype = np.float32
+) -> Tuple[List[str], List[np.ndarray]]:
+    """
+    Generates the (names, columns) of a costimulation file recorded with the
+    given protocol, with the given number of column groups (runs). The first
+    column is the time, and the first column of each group is the membrane
+    voltage, the others being stimulus commands.
+
+    Each run has a costimulation pulse (optical at the costim onset and
+    electrical at the run's offset from it), then an electrical pulse and
+    an optical pulse. Each causes an AP with the given (costim, electrical,
+    optical) probability, otherwise a subthreshold response.
+    """
+    rng = np.random.RandomState(seed)
+    frequency = protocol.frequency
+    length = max(x.stop for x in protocol.index.slices.values())
+    onsets = {k: float(v.magnitude) for k, v in protocol.onsets.items()}
+    offsets = protocol.sweep_offsets(groups)
+
+    names = ["Time (s)"]
+    columns = [np.arange(length) / frequency]
+
+    for offset in offsets:
+        sweep = _base_sweep(rng, length)
+        costim_elec = onsets["costim"] + offset * 0.001
+        spikes = rng.uniform(size=3) < ap_probability
+
+        if spikes[0]:
+            _add_response(sweep, frequency, max(onsets["costim"], costim_elec) + AP_DELAY, AP_SHAPE)
+        else:
+            _add_response(sweep, frequency, onsets["costim"], OPTICAL_SHAPE)
+            _add_response(sweep, frequency, costim_elec, ELECTRICAL_SHAPE)
+
+        _add_response(
+            sweep, frequency, onsets["electrical"] + (AP_DELAY if spikes[1] else 0),
+            AP_SHAPE if spikes[1] else ELECTRICAL_SHAPE)
+        _add_response(
+            sweep, frequency, onsets["optical"] + (AP_DELAY if spikes[2] else 0),
+            AP_SHAPE if spikes[2] else OPTICAL_SHAPE)
+
+        names.append("Membrane Voltage (V)")
+        columns.append(sweep.astype(dtype))
+
+        for i in range(1, protocol.column_count):
+            names.append(f"Command {i}")
+            columns.append(_stimulus_column(
+                length, frequency, [costim_elec, onsets["electrical"]], 0.003).astype(dtype))
+
+    return names, columns
+
+
+def pulse_train_sweeps(
+        groups: int,
+        pulse_width: float,
+        pulse_isi: float,
+        levels: int,
+        seed: int = 0,
+        num_pulses: int = 10,
+        train_onset: float = 0.4,
+        duration: float = 1.,
+        frequency: int = 50000,
+        dtype: np.dtype = np.float32
+) -> Tuple[List[str], List[np.ndarray]]:
+    """
+    Generates the (names, columns) of a pulse train file with the given number
+    of (membrane voltage, command) column groups. Each run is a train of pulses
+    with the given optical pulse width and inter-stimulus interval (ms), and the
+    electrical current steps through the given number of levels. The probability
+    of each pulse causing an AP rises with the current level.
+    """
+    rng = np.random.RandomState(seed)
+    length = int(duration * frequency)
+    period = (pulse_width + pulse_isi) * 0.001
+    pulse_onsets = train_onset + period * np.arange(num_pulses)
+
+    names = ["Time (s)"]
+    columns = [np.arange(length) / frequency]
+
+    for i in range(groups):
+        sweep = _base_sweep(rng, length)
+        probability = (i % levels + 1) / levels
+
+        for onset in pulse_onsets:
+            if rng.uniform() < probability:
+                _add_response(sweep, frequency, onset + AP_DELAY, AP_SHAPE)
+            else:
+                _add_response(sweep, frequency, onset, OPTICAL_SHAPE)
+
+        names.extend(["Membrane Voltage (V)", "Command"])
+        columns.append(sweep.astype(dtype))
+        columns.append(_stimulus_column(length, frequency, pulse_onsets, pulse_width * 0.001).astype(dtype))
+
+    return names, columns
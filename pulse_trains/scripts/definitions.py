@@ -4,6 +4,8 @@ Gives several definitions used in the import / analysis process
 
 import quantities as q
 
+from sgn import constants
+
 #
 # The location of files
 #
@@ -25,4 +27,4 @@ O_T = 9     # The optical threshold
 E_T = 10    # The electrical threshold
 CELL = 11   # The cell ID
 
-JNC_POT = -12.8 * q.mV
+JNC_POT = constants.JNC_POT_MV * q.mV
@@ -3,19 +3,23 @@ Contains import / analysis handlers for Axograph files
 """
 
 import math
+import multiprocessing
 import os
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from typing import List, Sequence
 
-import axographio
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 import quantities as q
-import seaborn as sns
 
 import definitions as d
-from pulse_train_run import PulseTrainRun
+from sgn import profiling
+from sgn.pulse_train_run import PulseTrainRun, RunMetrics
+from sgn.sweeps import SweepReader
 
+LoadResult = namedtuple('LoadResult', 'meta data error')
 
 class FileData(object):
     """
@@ -37,46 +41,62 @@ class FileData(object):
     opt_pulse_width: float
     opt_pulse_isi: float
 
-    def __init__(self, meta):
+    def __init__(self, meta, sweeps: SweepReader = None):
+        """
+        Reads and analyses the axograph file described by the given manifest
+        row, or if sweeps are given (e.g. synthetic data) analyses those instead
+        """
         self._path = os.path.join(d.BASE_PATH, meta[d.PATH])
 
-        # build up child traces
-        try:
-            axo = axographio.read(self._path)
-        except IOError:
-            print(f"IOError reading in {self._path}")
-            return
-
-        column_count = len(np.unique(np.array(axo.names[1:])))
-        self._len = (len(axo.data) - 1) // column_count
-
-        # read in the axograph data
-        self._times = axo.data[0] * q.s
-        print("Processing %s which has %s runs" % (self._path, self._len))
-
-        # convert optical powers
-        converted_opt_pow = self.convert_optical_power(meta[d.O_P])
-        converted_opt_thresh = self.convert_optical_power(meta[d.O_T])
-        used_opt_pow = 0 if meta[d.O_P] == 0 else math.floor(100 * converted_opt_pow / converted_opt_thresh)
-
-        # store cell metadata
-        self._meta = meta
-        self.opt_pow = used_opt_pow
-        self.min_current = meta[d.E_M]
-        self.max_current = meta[d.E_X]
-        self.sample_period = self._times[1] - self._times[0]
-        self.opt_pulse_width = meta[d.O_W]
-        self.opt_pulse_isi = meta[d.O_I]
-
-        elec_currents = self.get_electrical_powers()
-
-        self.runs = [
-            PulseTrainRun(
-                self,
-                meta,
-                math.floor(100 * elec_currents[i % meta[d.LVL]] / meta[d.E_T]), x) \
-                for i, x in enumerate(axo.data[1::column_count])
-        ]
+        with profiling.for_file(self._path):
+            # build up child traces
+            try:
+                if sweeps is None:
+                    with profiling.stage("read"):
+                        sweeps = SweepReader(self._path)
+            except IOError:
+                print(f"IOError reading in {self._path}")
+                raise
+
+            column_count = len(np.unique(np.array(sweeps.names[1:])))
+            self._len = (len(sweeps) - 1) // column_count
+
+            # read in the axograph data
+            self._times = sweeps.times * q.s
+            print("Processing %s which has %s runs" % (self._path, self._len))
+
+            # convert optical powers
+            converted_opt_pow = self.convert_optical_power(meta[d.O_P])
+            converted_opt_thresh = self.convert_optical_power(meta[d.O_T])
+            used_opt_pow = 0 if meta[d.O_P] == 0 else math.floor(100 * converted_opt_pow / converted_opt_thresh)
+
+            # store cell metadata
+            self._meta = meta
+            self.opt_pow = used_opt_pow
+            self.min_current = meta[d.E_M]
+            self.max_current = meta[d.E_X]
+            self.sample_period = self._times[1] - self._times[0]
+            self.opt_pulse_width = meta[d.O_W]
+            self.opt_pulse_isi = meta[d.O_I]
+
+            elec_currents = self.get_electrical_powers()
+
+            # each sweep is analysed as it is read and then released, only the
+            # first sweep in each group of columns is used
+            self.runs = []
+            for idx, sweep in sweeps:
+                if (idx - 1) % column_count != 0:
+                    continue
+
+                i = len(self.runs)
+                self.runs.append(PulseTrainRun(
+                    self,
+                    math.floor(100 * elec_currents[i % meta[d.LVL]] / meta[d.E_T]),
+                    meta[d.E_T],
+                    meta[d.CELL],
+                    sweep))
+
+            profiling.count("runs", len(self.runs))
 
     def convert_optical_power(self, power: int) -> float:
         """
@@ -99,8 +119,7 @@ class FileData(object):
         if not all_runs:
             return elec_currents
 
-        elec_currents = elec_currents * (math.ceil(self._len / self._meta[d.LVL]))
-        return elec_currents[:self._len]
+        return np.resize(elec_currents, len(self.runs))
 
     def __len__(self):
         return self._len
@@ -118,6 +137,9 @@ class FileData(object):
                  plot_duplicate_param_runs=True
                 ):
         """Plots all the runs in a grid"""
+        import matplotlib.pyplot as plt # pylint: disable=import-outside-toplevel
+        import seaborn as sns # pylint: disable=import-outside-toplevel
+
         cols = 4
         rows = math.ceil(self._meta[d.LVL] / cols)
         fig, axs = plt.subplots(rows, cols, sharex=True, sharey=True, figsize=(16, 9))
@@ -158,38 +180,89 @@ class FileData(object):
 
     def to_df(self):
         """Converts the summary data to a pandas dataframe"""
+        num = len(self.runs)
+        spikes = np.empty(num, dtype=np.int64)
+        elec_thresh = np.empty(num, dtype=np.int64)
+        cells = np.empty(num, dtype=np.int64)
+        metrics = np.empty((num, len(RunMetrics._fields)), dtype=np.float64)
+
+        for i, run in enumerate(self.runs):
+            spikes[i] = len(run.peaks)
+            elec_thresh[i] = run.elec_thresh
+            cells[i] = run.cell
+            metrics[i] = run.metrics
 
         data = {
-            "Run": [self._path] * self._len,
-            "Optical Power": [self.opt_pow] * self._len,
-            "Spikes": [len(x.peaks) for x in self.runs],
+            "Run": np.full(num, self._path),
+            "Optical Power": np.full(num, self.opt_pow),
+            "Spikes": spikes,
             "Electrical Power": self.get_electrical_powers(True),
-            "Electrical Threshold": [x.elec_thresh for x in self.runs],
-            "Vector Strength": [x.get_vector_strength(self._times)[0] for x in self.runs],
-            "Vector Strength Phase": [x.get_vector_strength(self._times)[1] for x in self.runs],
-            "Adaption Ratio": [x.get_adaption_ratio() for x in self.runs],
-            "Spike Ratio": [x.get_spike_ratio() * 100 for x in self.runs],
-            "Frequency": [x.get_frequency() for x in self.runs],
-            "Cell": [x.cell for x in self.runs]
+            "Electrical Threshold": elec_thresh,
+            "Vector Strength": metrics[:, 0],
+            "Vector Strength Phase": metrics[:, 1],
+            "Adaption Ratio": metrics[:, 2],
+            "Spike Ratio": metrics[:, 3] * 100,
+            "Frequency": metrics[:, 4].astype(np.int64),
+            "Cell": cells
         }
 
+        import pandas as pd # pylint: disable=import-outside-toplevel
         return pd.DataFrame(data)
 
 
-def generate_df_and_write_csv(files: Sequence[FileData], path: str) -> pd.DataFrame:
+def _load_file(meta, base_path: str = None) -> LoadResult:
+    """
+    Loads a single row of the file manifest. Any exception raised while
+    loading is captured in the result rather than propagated.
+
+    If base_path is given it replaces d.BASE_PATH, as spawned worker processes
+    re-import the definitions rather than inheriting any change made to them.
+    """
+    if base_path is not None:
+        d.BASE_PATH = base_path
+
+    try:
+        return LoadResult(meta, FileData(meta), None)
+    except Exception: # pylint: disable=broad-except
+        return LoadResult(meta, None, traceback.format_exc())
+
+
+def load_all(metas: Sequence[list], workers: int = 1) -> List[LoadResult]:
+    """
+    Loads every row in the given file manifest (e.g. FILES), spreading the
+    files over a pool of `workers` processes. If workers is 1 the files are
+    loaded serially in this process, if it is None one process is used per CPU.
+
+    A file that fails to load does not stop the batch, instead its traceback
+    is stored in the `error` field of its result. As for the costimulation
+    load_all, the files are loaded serially if this module has been %run
+    into __main__ and worker processes are spawned rather than forked.
+
+    Returns: a LoadResult(meta, data, error) per manifest row, in manifest order
+    """
+    load_file = partial(_load_file, base_path=d.BASE_PATH)
+
+    if workers != 1 and _load_file.__module__ == "__main__" \
+            and multiprocessing.get_start_method() != "fork":
+        print("load_all must be imported (not %run) to use worker processes, loading serially")
+        workers = 1
+
+    if workers == 1:
+        return [load_file(x) for x in metas]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return profiling.map_profiled(pool, load_file, metas)
+
+
+def generate_df_and_write_csv(files: Sequence[FileData], path: str) -> "pandas.DataFrame":
     """
     Generates a pandas dataframe from the passed FileData objects, and writes
     the resulting dataframe to CSV.
 
     Returns: the dataframe
     """
-    fdf: pd.DataFrame = None
-
-    for file in files:
-        if fdf is None:
-            fdf = file.to_df()
-        else:
-            fdf = fdf.append(file.to_df())
+    import pandas as pd # pylint: disable=import-outside-toplevel
+    fdf = pd.concat([file.to_df() for file in files])
 
     fdf = fdf.reset_index()
     fdf.to_csv(path)
@@ -2,8 +2,12 @@
 Gathers together some analysis tools
 """
 
+from typing import Sequence, Tuple
+
 import numpy as np
-import quantities as q
+import pandas as pd
+
+from sgn import buckets
 
 class Analysis(object):
     """
@@ -14,7 +18,48 @@ class Analysis(object):
     @staticmethod
     def bucket(val, bucket):
         """Converts a value into a bucketed value"""
-        return int(bucket * round(val / bucket))
+        return int(buckets.buckets(val, bucket))
+
+    @staticmethod
+    def buckets(values: Sequence[float], width: int, rounding: str = "round") -> np.ndarray:
+        """
+        Converts every value into a bucketed value at once (see sgn.buckets). With
+        "round" this gives the same result as bucket, and with "floor" the same as
+        FileData._num_to_bucket
+        """
+        return buckets.buckets(values, width, rounding)
+
+    @staticmethod
+    def run_table(runs: Sequence["CostimulationRun"]) -> pd.DataFrame:
+        """
+        Gathers the scalar features used for selection and aggregation of the given
+        runs into a columnar table, one row per run in the same order
+        """
+        num = len(runs)
+        columns = {
+            "cell": np.empty(num, dtype=np.int64),
+            "offset": np.empty(num, dtype=np.int64),
+            "v_rest": np.empty(num, dtype=np.float64),
+            "opt_thresh": np.empty(num, dtype=np.float64),
+            "elec_thresh": np.empty(num, dtype=np.float64),
+            "costim_aps": np.empty(num, dtype=bool),
+            "elec_aps": np.empty(num, dtype=bool),
+            "opt_aps": np.empty(num, dtype=bool),
+            "opt_max_mv": np.empty(num, dtype=np.float64),
+        }
+
+        for i, run in enumerate(runs):
+            columns["cell"][i] = run.cell
+            columns["offset"][i] = run.offset
+            columns["v_rest"][i] = run.v_rest
+            columns["opt_thresh"][i] = run.opt_thresh
+            columns["elec_thresh"][i] = run.elec_thresh
+            columns["costim_aps"][i] = run.costim_aps
+            columns["elec_aps"][i] = run.elec_aps
+            columns["opt_aps"][i] = run.opt_aps
+            columns["opt_max_mv"][i] = run.maxima_mv[2]
+
+        return pd.DataFrame(columns)
 
     @staticmethod
     def correct_hold(run, min_val, max_val):
@@ -105,37 +150,134 @@ class Analysis(object):
         Find the point in the data where the threshold value is crossed.
         Returns the index or -1 if the threshold is never crossed
         """
+        data = np.asarray(data)
+
+        if start_idx >= 0:
+            tail = data[start_idx:]
+        else:
+            # as for range(start_idx, len(data)), i.e. wrapping around from the end
+            tail = data[np.arange(start_idx, len(data))]
+
+        crossed = tail <= threshold if data[start_idx] > threshold else tail >= threshold
+        idx = np.argmax(crossed)
+
+        return start_idx + int(idx) if crossed[idx] else -1
+
+    @staticmethod
+    def find_crossing(data, start_idx: int, threshold: float) -> float:
+        """
+        As for find_crossing_index, but linearly interpolates between the samples either
+        side of the crossing to give a fractional index. Returns nan if the threshold
+        is never crossed.
+        """
+        idx = Analysis.find_crossing_index(data, start_idx, threshold)
+        if idx == -1:
+            return np.nan
+
+        return Analysis._interpolate_crossing(np.asarray(data), idx, start_idx, threshold)
+
+    @staticmethod
+    def _interpolate_crossing(data, idx: int, start_idx: int, threshold: float) -> float:
+        """Gets the fractional index where the threshold is crossed between idx - 1 and idx"""
+        if idx == start_idx:
+            return float(idx)
+
+        before = float(data[idx - 1])
+        after = float(data[idx])
+        if after == before:
+            return float(idx)
+
+        return idx - 1 + (threshold - before) / (after - before)
+
+    @staticmethod
+    def find_crossing_indices(
+            data: np.ndarray,
+            start_idxs: Sequence[int],
+            thresholds: Sequence[float],
+            interpolate: bool = False
+    ) -> np.ndarray:
+        """
+        Finds the threshold crossing in each row of the given (runs x samples) data at
+        once. start_idxs and thresholds may be a single value, or one value per row,
+        and start indices must not be negative.
+
+        Returns the index of each crossing as for find_crossing_index (-1 if not crossed),
+        or if interpolate is True the fractional index as for find_crossing (nan if
+        not crossed).
+        """
+        data = np.atleast_2d(np.asarray(data))
+        rows = np.arange(data.shape[0])
+        start_idxs = np.broadcast_to(np.asarray(start_idxs, dtype=np.intp), rows.shape)
+        thresholds = np.broadcast_to(np.asarray(thresholds, dtype=np.float64), rows.shape)
 
-        check_less = lambda x: x <= threshold
-        check_greater = lambda x: x >= threshold
-        check = check_less if data[start_idx] > threshold else check_greater
+        falling = (data[rows, start_idxs] > thresholds)[:, None]
+        crossed = np.where(
+            falling,
+            data <= thresholds[:, None],
+            data >= thresholds[:, None])
+        crossed &= np.arange(data.shape[1]) >= start_idxs[:, None]
 
-        for idx in range(start_idx, len(data)):
-            if check(data[idx]):
-                return idx
+        idxs = np.argmax(crossed, axis=1)
+        found = crossed[rows, idxs]
 
-        return -1
+        if not interpolate:
+            return np.where(found, idxs, -1)
+
+        before = data[rows, np.maximum(idxs - 1, 0)].astype(np.float64)
+        after = data[rows, idxs].astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = (thresholds - before) / (after - before)
+
+        exact = (idxs == start_idxs) | (after == before)
+        return np.where(found, np.where(exact, idxs, idxs - 1 + fraction), np.nan)
 
     @staticmethod
     def mavg(data, period):
-        """Calculates a moving average of the given data set"""
-        return [
-            data[i - period : i].sum() / period for i in range(period, len(data))
-        ]
+        """
+        Calculates a moving average of the given data set, i.e. the mean of
+        data[i - period:i] for each i from period up to (but excluding) len(data)
+        """
+        data = np.asarray(data, dtype=np.float64)
+        if period >= len(data):
+            return np.empty(0)
+
+        sums = np.concatenate(([0.], np.cumsum(data)))
+        return (sums[period:-1] - sums[:-period - 1]) / period
+
+    @staticmethod
+    def phase_planes(data) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculates the phase plane trajectories for every row of the given (runs x samples)
+        data in V, or for a single trace.
+
+        Returns (voltage in mV, dV/dt in mV / ms), each (runs x samples - 1)
+        """
+        voltage = np.atleast_2d(np.asarray(data)) * 1000 # to mV
+        dvdt = np.diff(voltage, axis=1) / 2e-2 # mV / ms
+        return (voltage[:, 1:], dvdt)
 
     @staticmethod
     def draw_phase_plot(axis, data, legend=False, **kwargs):
         """
         Draws a phase plot on the given axis with the given Costim Run object
         """
-        dataq = q.Quantity(data, 'V').rescale('mV')
-        # dqma = Analysis.mavg(dataq, 3)
-        # dvdt = np.diff(dqma)
-        dvdt = np.diff(dataq) / 2e-2 # mV / ms
-        axis.plot(dataq[1:], dvdt, **kwargs)
+        (voltage, dvdt) = Analysis.phase_planes(data)
+        axis.plot(voltage[0], dvdt[0], **kwargs)
 
         if legend:
             axis.legend()
 
         axis.set_xlabel("Voltage (mV)")
         axis.set_ylabel("dV/dt (mV/ms)")
+
+    @staticmethod
+    def draw_phase_density(axis, data, bins=100, **kwargs):
+        """
+        Draws the phase plots of every row of the given (runs x samples) data as a
+        single 2D histogram on the given axis
+        """
+        (voltage, dvdt) = Analysis.phase_planes(data)
+        axis.hist2d(voltage.ravel(), dvdt.ravel(), bins=bins, **kwargs)
+
+        axis.set_xlabel("Voltage (mV)")
+        axis.set_ylabel("dV/dt (mV/ms)")
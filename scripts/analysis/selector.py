@@ -0,0 +1,144 @@
+"""
+Vectorised run selection, applying the Analysis predicates to a whole run table at once
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis import Analysis
+
+
+class Selector(object):
+    """
+    Selects runs from a columnar run table (see Analysis.run_table) using boolean
+    masks. Each rule gives the same result as the matching Analysis predicate
+    applied to every run, e.g. costim is Analysis.costim_selector.
+
+    Masks are cached by rule and parameters, so re-selecting with the same
+    parameters is free and e.g. a different hold window only recalculates
+    the correct_hold mask. Masks can be combined with &, | and ~.
+
+    Bucketed columns (see bucket) are similarly cached by column and width.
+    """
+
+    table: pd.DataFrame
+    _masks: Dict[Tuple, np.ndarray]
+    _buckets: Dict[Tuple, np.ndarray]
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table
+        self._masks = {}
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self.table)
+
+    def mask(self, rule: str, *params) -> np.ndarray:
+        """
+        Gets the read only mask for the given rule (e.g. "correct_hold") and
+        parameters, calculating it on first use
+        """
+        key = (rule,) + params
+        if key not in self._masks:
+            mask = getattr(self, f"_{rule}")(*params)
+            mask.setflags(write=False)
+            self._masks[key] = mask
+
+        return self._masks[key]
+
+    def bucket(self, column: str, width: int, rounding: str = "round") -> np.ndarray:
+        """
+        Gets the read only bucketed values of the given column for every run (see
+        Analysis.buckets), calculating them on first use
+        """
+        key = (column, width, rounding)
+        if key not in self._buckets:
+            buckets = Analysis.buckets(self._column(column), width, rounding)
+            buckets.setflags(write=False)
+            self._buckets[key] = buckets
+
+        return self._buckets[key]
+
+    def select(self, runs: Sequence["CostimulationRun"], mask: np.ndarray) -> List["CostimulationRun"]:
+        """Gets the runs where the mask is true, given the runs the table was built from"""
+        return [runs[i] for i in np.flatnonzero(mask)]
+
+    def clear(self):
+        """Removes all cached masks and buckets, e.g. if the table has been modified"""
+        self._masks = {}
+        self._buckets = {}
+
+    def _column(self, name: str) -> np.ndarray:
+        return self.table[name].values
+
+    def _correct_hold(self, min_val: float, max_val: float) -> np.ndarray:
+        v_rest = self._column("v_rest")
+        return (v_rest >= min_val) & (v_rest <= max_val)
+
+    def _no_opt_or_elec_aps(self) -> np.ndarray:
+        return (self._column("elec_aps") == 0) & (self._column("opt_aps") == 0)
+
+    def _any_aps(self) -> np.ndarray:
+        return (
+            (self._column("elec_aps") == 1)
+            | (self._column("opt_aps") == 1)
+            | (self._column("costim_aps") == 1)
+        )
+
+    def _opt_thresh_within(self, low: float, high: float) -> np.ndarray:
+        # exclusive of both ends
+        opt_thresh = self._column("opt_thresh")
+        return (opt_thresh > low) & (opt_thresh < high)
+
+    def _max_offset(self, max_offset: int) -> np.ndarray:
+        return self._column("offset") <= max_offset
+
+    def _opt_depolarised(self) -> np.ndarray:
+        return ~(self._column("opt_max_mv") < self._column("v_rest"))
+
+    def _no_opt_aps(self) -> np.ndarray:
+        return self._column("opt_aps") != 1
+
+    def _valid_data(self, min_hold: float, max_hold: float) -> np.ndarray:
+        return self.correct_hold(min_hold, max_hold) & self.mask("opt_thresh_within", 0, 130)
+
+    def _costim(self, min_hold: float, max_hold: float) -> np.ndarray:
+        return (
+            self.correct_hold(min_hold, max_hold)
+            & self.no_opt_or_elec_aps()
+            & self.mask("opt_thresh_within", 0, 100)
+        )
+
+    def _subthresh_opt(self, min_hold: float, max_hold: float) -> np.ndarray:
+        return (
+            self.correct_hold(min_hold, max_hold)
+            & self.mask("no_opt_aps")
+            & self.mask("max_offset", 30)
+            & self.mask("opt_depolarised")
+        )
+
+    def correct_hold(self, min_val: float, max_val: float) -> np.ndarray:
+        """Vectorised Analysis.correct_hold"""
+        return self.mask("correct_hold", min_val, max_val)
+
+    def no_opt_or_elec_aps(self) -> np.ndarray:
+        """Vectorised Analysis.no_opt_or_elec_aps"""
+        return self.mask("no_opt_or_elec_aps")
+
+    def any_aps(self) -> np.ndarray:
+        """Vectorised Analysis.any_aps"""
+        return self.mask("any_aps")
+
+    def valid_data(self, min_hold: float, max_hold: float) -> np.ndarray:
+        """Vectorised Analysis.valid_data_selector"""
+        return self.mask("valid_data", min_hold, max_hold)
+
+    def costim(self, min_hold: float, max_hold: float) -> np.ndarray:
+        """Vectorised Analysis.costim_selector"""
+        return self.mask("costim", min_hold, max_hold)
+
+    def subthresh_opt(self, min_hold: float, max_hold: float) -> np.ndarray:
+        """Vectorised Analysis.subthresh_opt_selector"""
+        return self.mask("subthresh_opt", min_hold, max_hold)
@@ -2,6 +2,11 @@
 Data structure for analysis of spiking probability by mode
 """
 
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
 
 class SpikeResults(object):
     """Analysis spiking probability in a dataset"""
@@ -31,6 +36,37 @@ class SpikeResults(object):
         """Returns true if the costim spike rate is greater than 0"""
         return self.costim() >= 50
 
+    @staticmethod
+    def aggregate(
+            table: pd.DataFrame,
+            keys: Sequence[str] = ("opt_bucket", "elec_bucket", "offset")
+    ) -> pd.DataFrame:
+        """
+        Aggregates spike data from a columnar run table (e.g. from Analysis.run_table)
+        in a single groupby. Gives one row per combination of the key columns, in
+        order of first appearance, with the same values as get_spikes:
+         - runs, cells: the number of runs and distinct cells
+         - costim_spikes, opt_spikes, elec_spikes: the number of runs with APs in each mode
+         - costim, opt, elec: the percentage of runs with APs in each mode
+         - thresh: whether costim is at least 50%
+        """
+        result = table.groupby(list(keys), sort=False).agg(
+            runs=("cell", "size"),
+            cells=("cell", "nunique"),
+            costim_spikes=("costim_aps", "sum"),
+            opt_spikes=("opt_aps", "sum"),
+            elec_spikes=("elec_aps", "sum")
+        ).reset_index()
+
+        for mode in ["costim", "opt", "elec"]:
+            spikes = result[f"{mode}_spikes"].astype(np.int64)
+            result[f"{mode}_spikes"] = spikes
+            result[mode] = np.round(100. * spikes / result["runs"]).astype(np.int64)
+
+        result["thresh"] = result["costim"] >= 50
+
+        return result
+
     @staticmethod
     def get_spikes(data):
         """Gets spike data from the given dataset"""
@@ -0,0 +1,153 @@
+"""
+Streaming mean / SEM of traces, for averaged responses across runs or files
+"""
+
+from typing import Callable, Dict, Hashable, Iterable, List, Sequence, Union
+
+import numpy as np
+
+
+class TraceAggregator(object):
+    """
+    Accumulates the point by point mean, variance, SEM and count of traces
+    using Welford's online algorithm, so only one trace (or one batch of
+    traces) is held at a time, rather than every trace as for np.mean or
+    stats.sem.
+
+    Each trace is cut to the window, then scaled and offset (e.g. scale=1000
+    for V to mV) before being accumulated. Traces can optionally be grouped
+    by key, with separate statistics for each key.
+    """
+
+    window: slice
+    scale: float
+    offset: float
+
+    # per key count, mean and sum of squared differences from the mean
+    _counts: Dict[Hashable, int]
+    _means: Dict[Hashable, np.ndarray]
+    _m2s: Dict[Hashable, np.ndarray]
+
+    def __init__(self, window: slice = None, scale: float = 1., offset: float = 0.):
+        self.window = slice(None) if window is None else window
+        self.scale = scale
+        self.offset = offset
+        self._counts = {}
+        self._means = {}
+        self._m2s = {}
+
+    @staticmethod
+    def for_stimulus(
+            protocol: "Protocol",
+            stimulus: str,
+            scale: float = 1.,
+            offset: float = 0.
+    ) -> "TraceAggregator":
+        """
+        Creates an aggregator for the window around the given stimulus
+        (e.g. "optical") of whole run traces recorded with the given protocol
+        """
+        return TraceAggregator(protocol.index.slices[stimulus], scale, offset)
+
+    def __len__(self):
+        return sum(self._counts.values())
+
+    def keys(self) -> List[Hashable]:
+        """The keys that have had traces added, in the order they were first added"""
+        return list(self._counts)
+
+    def _prepare(self, traces: np.ndarray) -> np.ndarray:
+        data = np.asarray(traces, dtype=np.float64)[..., self.window]
+        if self.scale != 1.:
+            data = data * self.scale
+        if self.offset != 0.:
+            data = data + self.offset
+
+        return data
+
+    def add(self, trace: Sequence[float], key: Hashable = None):
+        """Adds a single trace"""
+        data = self._prepare(trace)
+
+        if key not in self._counts:
+            self._counts[key] = 1
+            self._means[key] = data.copy()
+            self._m2s[key] = np.zeros_like(self._means[key])
+            return
+
+        self._counts[key] += 1
+        delta = data - self._means[key]
+        self._means[key] += delta / self._counts[key]
+        self._m2s[key] += delta * (data - self._means[key])
+
+    def add_many(self, traces: Union[np.ndarray, Sequence[Sequence[float]]], key: Hashable = None):
+        """
+        Adds a batch of traces (one per row), merging the batch statistics in
+        one step (Chan et al.) rather than adding each trace in turn
+        """
+        data = self._prepare(traces)
+        if len(data) == 0:
+            return
+
+        mean = data.mean(axis=0)
+        self._merge(key, len(data), mean, np.square(data - mean).sum(axis=0))
+
+    def add_runs(
+            self,
+            runs: Iterable["CostimulationRun"],
+            stimulus: str = None,
+            key: Union[Hashable, Callable[["CostimulationRun"], Hashable]] = None
+    ):
+        """
+        Adds the data of each run, either the whole run or the window around
+        the given stimulus (e.g. "optical" for run.opt_data). The key is either
+        a fixed key or a function of the run, e.g. lambda run: run.cell
+        """
+        for run in runs:
+            trace = run.data
+            if stimulus is not None:
+                trace = trace[run.file_data.protocol.index.slices[stimulus]]
+            self.add(trace, key(run) if callable(key) else key)
+
+    def count(self, key: Hashable = None) -> int:
+        """The number of traces added for the key"""
+        return self._counts.get(key, 0)
+
+    def mean(self, key: Hashable = None) -> np.ndarray:
+        """The point by point mean of the traces for the key"""
+        return self._means[key].copy()
+
+    def variance(self, key: Hashable = None, ddof: int = 1) -> np.ndarray:
+        """The point by point variance of the traces for the key, NaN if there are too few traces"""
+        count = self._counts[key]
+        if count <= ddof:
+            return np.full_like(self._means[key], np.nan)
+
+        return self._m2s[key] / (count - ddof)
+
+    def std(self, key: Hashable = None, ddof: int = 1) -> np.ndarray:
+        """The point by point standard deviation of the traces for the key"""
+        return np.sqrt(self.variance(key, ddof))
+
+    def sem(self, key: Hashable = None, ddof: int = 1) -> np.ndarray:
+        """The point by point standard error of the mean for the key, as per stats.sem"""
+        return np.sqrt(self.variance(key, ddof) / self._counts[key])
+
+    def merge(self, other: "TraceAggregator"):
+        """Merges in the statistics of another aggregator, e.g. one per file or process"""
+        for key in other.keys():
+            self._merge(key, other._counts[key], other._means[key], other._m2s[key])
+
+    def _merge(self, key: Hashable, count: int, mean: np.ndarray, m2: np.ndarray):
+        """Merges the statistics of a group of traces into the key (Chan et al.)"""
+        if key not in self._counts:
+            self._counts[key] = count
+            self._means[key] = mean.copy()
+            self._m2s[key] = m2.copy()
+            return
+
+        total = self._counts[key] + count
+        delta = mean - self._means[key]
+        self._means[key] += delta * (count / total)
+        self._m2s[key] += m2 + np.square(delta) * (self._counts[key] * count / total)
+        self._counts[key] = total
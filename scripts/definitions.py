@@ -2,7 +2,8 @@ r"""
 Gives several definitions used in the import / analysis process
 """
 
-from protocol import Protocol
+from sgn import constants
+from sgn.protocol import Protocol
 
 #
 # The location of files
@@ -41,4 +42,12 @@ PARAMS = [
     Protocol(6, -3, 9, 4, column_count=2, optical_onset=1.5),
 ]
 
-JNC_POT = -12.8 / 1000.
+JNC_POT = constants.JNC_POT # in V
+
+#
+# The version of the analysis code. Increment this whenever a change is made
+# that alters the analysed FileData / CostimulationRun results or how they are
+# pickled (e.g. their attributes or __slots__), so that any cached analysis is
+# rebuilt.
+#
+ANALYSIS_VERSION = 7
@@ -2,18 +2,40 @@ r"""
 Contains import / analysis handlers for Axograph files
 """
 
+import gzip
+import hashlib
+import json
 import math
+import multiprocessing
 import os
-from typing import List, Sequence
+import pickle
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Sequence
 
-import axographio
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 
 import definitions as d
-from costimulation_run import CostimulationRun
-
+from sgn import profiling
+from sgn.buckets import buckets
+from sgn.costimulation_run import CostimulationRun
+from sgn.sweeps import SweepReader
+from sgn.time_constants import TimeConstants
+
+LoadResult = namedtuple('LoadResult', 'meta data error')
+
+# the time constant columns for each stimulus mode in FileData.to_df, in the
+# order given by TimeConstants.magnitudes
+TIME_CONSTANT_COLUMNS = [
+    "onset_latency_ms",
+    "peak_latency_ms",
+    "0mV_duration_ms",
+    "fwhm_duration_ms",
+    "t_on_ms",
+    "t_off_ms",
+]
 
 class FileData(object):
     """
@@ -27,6 +49,8 @@ class FileData(object):
     _path: str
     times: List[float]
     _len: int
+    _traces: np.ndarray
+    _traces_path: str
 
     opt_pow: float
     elec_pow: float
@@ -36,22 +60,44 @@ class FileData(object):
     elec_thresh_bucket: int
     cell: int
 
-    def __init__(self, meta):
+    def __init__(
+            self,
+            meta,
+            trace_dir: str = None,
+            lazy: bool = False,
+            sweeps: SweepReader = None
+    ):
+        """
+        Reads and analyses the axograph file described by the given manifest row.
+
+        If trace_dir is given, the sweeps are written once to a memory mapped
+        (sweeps x samples) array in that directory, and runs read their data
+        from it on demand rather than each holding a copy.
+
+        If lazy is True, only the cheap per-run features (v_rest, maxima, APs, etc)
+        are calculated up front, and each run's time constants are calculated
+        the first time they are accessed.
+
+        If sweeps are given (e.g. synthetic data) they are analysed instead
+        of reading the file.
+        """
         self._path = os.path.join(d.BASE_PATH, meta[d.PATH])
 
         # build up child traces
         try:
-            axo = axographio.read(self._path) # pylint:ignore E1101
+            if sweeps is None:
+                with profiling.stage("read"):
+                    sweeps = SweepReader(self._path)
         except OSError:
             print(f"Unable to find file - {self._path}")
             raise
 
         self.protocol = d.PARAMS[meta[d.PAR]]
-        self._len = (len(axo.data) - 1) // self.protocol.column_count
-        offsets = self.protocol.offsets(self._len)
+        self._len = (len(sweeps) - 1) // self.protocol.column_count
+        offsets = self.protocol.sweep_offsets(self.protocol.group_count(len(sweeps))).tolist()
 
         # read in the axograph data
-        self.times = axo.data[0]
+        self.times = sweeps.times
         print("Processing %s which has %s runs" % (self._path, self._len))
 
         # convert optical powers
@@ -70,23 +116,141 @@ class FileData(object):
 
         # print(f"{converted_opt_pow}-{meta[d.O_P]} / {converted_opt_thresh}-{meta[d.O_T]} = {self.opt_thresh}")
 
-        self.runs = [
-            CostimulationRun(
-                self,
-                self.protocol,
-                x,
-                offsets[i],
-                self.elec_thresh,
-                self.opt_thresh,
-                self.cell
-            ) for i, x in enumerate(self.protocol.get_groups(axo))
-        ]
+        self._traces = None
+        self._traces_path = None
+
+        if trace_dir is not None:
+            name = os.path.splitext(os.path.basename(self._path))[0]
+            self._traces_path = os.path.join(trace_dir, f"{name}.npy")
+
+        # copy the first sweep of each group into a (runs x samples) array as it is
+        # read, written straight to disk if memory mapping. All other sweeps are
+        # released without being kept.
+        with profiling.stage("copy_sweeps"):
+            raw = None
+            for i, sweep in enumerate(self.protocol.get_groups(sweeps)):
+                if raw is None:
+                    shape = (self.protocol.group_count(len(sweeps)), len(sweep))
+                    dtype = np.asarray(sweep).dtype
+
+                    if trace_dir is None:
+                        raw = np.empty(shape, dtype=dtype)
+                    else:
+                        raw = np.lib.format.open_memmap(
+                            self._traces_path, mode="w+", dtype=dtype, shape=shape)
+
+                raw[i] = sweep
+
+            # a file without any data columns has no runs, and as an empty
+            # array can't be memory mapped there is no trace file either
+            if raw is None:
+                raw = np.empty((0, len(sweeps.times)))
+                self._traces_path = None
+
+        # analyse every run in the file at once
+        with profiling.stage("jnc_correction"):
+            data = raw + d.JNC_POT
+
+        with profiling.stage("detect_aps"):
+            aps = self.detect_aps(data, self.protocol)
+
+        period = self.protocol.period
+        descriptions = None if lazy else {
+            x: TimeConstants.describe_batch(
+                data[:, self.protocol.get_data_slice(x)],
+                self.protocol.sample_period,
+                25,
+                1000. / 50000.
+            ) for x in self.protocol.stim_type
+        }
+        del data
+
+        onsets = self.protocol.index.onsets
+        elec_onset = onsets["electrical"][0]
+        opt_onset = onsets["optical"][0]
+
+        with profiling.stage("build_runs"):
+            self.runs = [
+                CostimulationRun(
+                    self,
+                    self.protocol,
+                    x,
+                    offsets[i],
+                    self.elec_thresh,
+                    self.opt_thresh,
+                    self.cell,
+                    None if trace_dir is None else i,
+                    (aps["costim"][i], aps["electrical"][i], aps["optical"][i]),
+                    None if lazy else (
+                        TimeConstants.from_batch(
+                            descriptions["costim"][i],
+                            period,
+                            onsets["costim"][offsets[i]]),
+                        TimeConstants.from_batch(descriptions["electrical"][i], period, elec_onset),
+                        TimeConstants.from_batch(descriptions["optical"][i], period, opt_onset)
+                    ),
+                    lazy
+                ) for i, x in enumerate(raw)
+            ]
+
+        profiling.count("runs", len(self.runs))
+
+        if self._traces_path is not None:
+            raw.flush()
+        del raw
 
         self.any_aps = any(x.costim_aps for x in self.runs)
 
     def __len__(self):
         return self._len
 
+    def __getstate__(self):
+        # memory mapped traces are reopened from disk rather than pickled
+        state = self.__dict__.copy()
+        state["_traces"] = None
+        return state
+
+    @property
+    def traces(self) -> np.ndarray:
+        """
+        The raw (sweeps x samples) data for the file, memory mapped read only.
+        Only available if the file was loaded with a trace_dir.
+        """
+        if self._traces is None and self._traces_path is not None:
+            self._traces = np.load(self._traces_path, mmap_mode="r")
+
+        return self._traces
+
+    @staticmethod
+    def detect_aps(data: np.ndarray, protocol: d.Protocol) -> Dict[str, np.ndarray]:
+        """
+        Detects action potentials for every run of a file at once, given the
+        (runs x samples) data for the file. Gives the same result as calling
+        CostimulationRun.detect_aps on each stimulus window of each run.
+
+        Returns a dict of stimulus type to a boolean array with one value per run
+        """
+
+        slices = [protocol.get_data_slice(x) for x in protocol.stim_type]
+        start = min(x.start for x in slices)
+        stop = max(x.stop for x in slices)
+
+        # sample to sample differences for every run, across all stimulus windows
+        diff = np.diff(data[:, start:stop], axis=1)
+        period = protocol.sample_period
+        thresh = float(CostimulationRun._ap_detection_threshold.magnitude) # pylint: disable=protected-access
+
+        result = {}
+        for stimulus, data_slice in zip(protocol.stim_type, slices):
+            max_diff = np.max(diff[:, data_slice.start - start:data_slice.stop - start - 1], axis=1)
+
+            # The per-run derivative is padded with a leading zero. As the period is
+            # positive, dividing the maximum difference by the period gives exactly the
+            # maximum derivative (in V/s, i.e. numerically the same as mV/ms).
+            result[stimulus] = np.maximum(max_diff, 0) / period >= thresh
+
+        return result
+
     def convert_optical_power(self, power: int) -> float:
         """
         Converts an optical power in DAC, normalised to 2200 DAC. Uses the equation developed
@@ -100,8 +264,10 @@ class FileData(object):
 
     def plot(self, stride=1):
         """Plots all the given traces"""
+        import matplotlib.pyplot as plt # pylint: disable=import-outside-toplevel
+
         for run in self.runs[:self._len:stride]:
-            plt.plot(self.times, run.data.rescale('mV'))
+            plt.plot(self.times, run.data * 1000) # to mV
 
         plt.title(f"Action potentials for optical {self.opt_thresh}%," +\
             f" electrical {self.elec_thresh}%")
@@ -114,83 +280,351 @@ class FileData(object):
         Generates a "bucket" for the given number, by default rounding
         down to the nearest 5
         """
-        return int(base * math.floor(val / base))
+        return int(buckets(val, base, "floor"))
 
-    def to_df(self):
-        """Converts the summary data to a pandas dataframe"""
-
-        data = {
-            "cell": [self.cell] * self._len,
-            "run": [self._path] * self._len,
-            "optical_threshold": [self.opt_thresh] * self._len,
-            "opt_bucket": [self.opt_thresh_bucket] * self._len,
-            "electrical_threshold": [self.elec_thresh] * self._len,
-            "elec_bucket": [self.elec_thresh_bucket] * self._len,
-            "offset": [x.offset for x in self.runs],
-            "costim_aps": [1 if x.costim_aps else 0 for x in self.runs],
-            "costim_max_mv": [x.costim_max.magnitude for x in self.runs],
-            "costim_onset_latency_ms":
-                [x.costim_time_constants.onset_latency.magnitude for x in self.runs],
-            "costim_peak_latency_ms":
-                [x.costim_time_constants.peak_latency.magnitude for x in self.runs],
-            "costim_0mV_duration_ms":
-                [x.costim_time_constants.mv0_duration.magnitude for x in self.runs],
-            "costim_fwhm_duration_ms":
-                [x.costim_time_constants.fwhm_duration.magnitude for x in self.runs],
-            "costim_t_on_ms": [x.costim_time_constants.on_tau.magnitude for x in self.runs],
-            "costim_t_off_ms": [x.costim_time_constants.off_tau.magnitude for x in self.runs],
-
-
-            "elec_onset_latency_ms":
-                [x.elec_time_constants.onset_latency.magnitude for x in self.runs],
-            "elec_peak_latency_ms":
-                [x.elec_time_constants.peak_latency.magnitude for x in self.runs],
-            "elec_0mV_duration_ms":
-                [x.elec_time_constants.mv0_duration.magnitude for x in self.runs],
-            "elec_fwhm_duration_ms":
-                [x.elec_time_constants.fwhm_duration.magnitude for x in self.runs],
-            "elec_t_on_ms": [x.elec_time_constants.on_tau.magnitude for x in self.runs],
-            "elec_t_off_ms": [x.elec_time_constants.off_tau.magnitude for x in self.runs],
-
-
-            "opt_onset_latency_ms":
-                [x.opt_time_constants.onset_latency.magnitude for x in self.runs],
-            "opt_peak_latency_ms":
-                [x.opt_time_constants.peak_latency.magnitude for x in self.runs],
-            "opt_0mV_duration_ms":
-                [x.opt_time_constants.mv0_duration.magnitude for x in self.runs],
-            "opt_fwhm_duration_ms":
-                [x.opt_time_constants.fwhm_duration.magnitude for x in self.runs],
-            "opt_t_on_ms": [x.opt_time_constants.on_tau.magnitude for x in self.runs],
-            "opt_t_off_ms": [x.opt_time_constants.off_tau.magnitude for x in self.runs],
-
-
-            "elec_aps": [1 if x.elec_aps else 0 for x in self.runs],
-            "elec_max_mv": [x.elec_max.magnitude for x in self.runs],
-            "optical_aps": [1 if x.opt_aps else 0 for x in self.runs],
-            "opt_max_mv": [x.opt_max.magnitude for x in self.runs],
-
-            "v_rest": [x.v_rest for x in self.runs]
+    def columns(self) -> Dict[str, np.ndarray]:
+        """
+        Gathers the summary data into one array per column (see to_df), filling
+        preallocated arrays in a single pass over the runs
+        """
+        num = len(self.runs)
+        offsets = np.empty(num, dtype=np.int64)
+        aps = np.empty((num, 3), dtype=np.int64)
+        maxima = np.empty((num, 3), dtype=np.float64)
+        time_constants = np.empty((num, 3, len(TIME_CONSTANT_COLUMNS)), dtype=np.float64)
+        v_rest = np.empty(num, dtype=np.float64)
+
+        for i, run in enumerate(self.runs):
+            offsets[i] = run.offset
+            aps[i] = (run.costim_aps, run.elec_aps, run.opt_aps)
+            maxima[i] = run.maxima_mv
+            v_rest[i] = run.v_rest
+
+            for j, constants in enumerate(run.time_constants):
+                time_constants[i, j] = constants.magnitudes()
+
+        columns = {
+            "cell": np.full(num, self.cell),
+            "run": np.full(num, self._path),
+            "optical_threshold": np.full(num, self.opt_thresh),
+            "opt_bucket": np.full(num, self.opt_thresh_bucket),
+            "electrical_threshold": np.full(num, self.elec_thresh),
+            "elec_bucket": np.full(num, self.elec_thresh_bucket),
+            "offset": offsets,
+            "costim_aps": aps[:, 0],
+            "costim_max_mv": maxima[:, 0],
         }
 
-        return pd.DataFrame(data)
+        for j, prefix in enumerate(["costim", "elec", "opt"]):
+            for k, name in enumerate(TIME_CONSTANT_COLUMNS):
+                columns[f"{prefix}_{name}"] = time_constants[:, j, k]
+
+        columns["elec_aps"] = aps[:, 1]
+        columns["elec_max_mv"] = maxima[:, 1]
+        columns["optical_aps"] = aps[:, 2]
+        columns["opt_max_mv"] = maxima[:, 2]
+        columns["v_rest"] = v_rest
+
+        return columns
+
+    def to_df(self):
+        """Converts the summary data to a pandas dataframe"""
+        import pandas as pd # pylint: disable=import-outside-toplevel
+        return pd.DataFrame(self.columns())
 
 
-def generate_df_and_write_csv(files: Sequence[FileData], path: str) -> pd.DataFrame:
+def generate_df_and_write_csv(
+        files: Sequence[FileData],
+        path: str,
+        columnar_path: str = None
+) -> "pandas.DataFrame":
     """
     Generates a pandas dataframe from the passed FileData objects, and writes
-    the resulting dataframe to CSV.
+    the resulting dataframe to CSV. The same columns are also written to an
+    uncompressed numpy .npz archive at columnar_path, by default next to the CSV.
 
     Returns: the dataframe
     """
-    fdf: pd.DataFrame = None
+    per_file = [x.columns() for x in files]
 
-    for file in files:
-        if fdf is None:
-            fdf = file.to_df()
-        else:
-            fdf = fdf.append(file.to_df())
+    # as for each file's dataframe, the index restarts from 0 for each file
+    columns = {"index": np.concatenate([np.arange(len(x["run"])) for x in per_file])}
+    columns.update({k: np.concatenate([x[k] for x in per_file]) for k in per_file[0]})
 
-    fdf = fdf.reset_index()
+    import pandas as pd # pylint: disable=import-outside-toplevel
+    fdf = pd.DataFrame(columns)
     fdf.to_csv(path)
+
+    if columnar_path is None:
+        columnar_path = os.path.splitext(path)[0] + ".npz"
+
+    np.savez(columnar_path, **columns)
     return fdf
+
+
+class FileDataCache(object):
+    """
+    A per-file cache of analysed FileData objects, stored as one gzipped pickle
+    per file. Entries are keyed on the content hash of the axograph file, the
+    manifest row, how the traces are stored (in memory, or memory mapped from
+    trace_dir), whether it was loaded lazily and d.ANALYSIS_VERSION, so only
+    files where one of these has changed need to be re-analysed.
+
+    Entries are never removed implicitly, use `invalidate`, `evict` or `clear`.
+    Removing an entry also removes its memory mapped traces, unless another
+    entry still uses them. The trace file of each entry is recorded beside it
+    in a `.traces` file, so that entries can be removed without loading them.
+    """
+
+    _dir: str
+    _index_path: str
+    _hashes: Dict[str, list]
+
+    def __init__(self, cache_dir: str = "cache"):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._dir = cache_dir
+
+        # content hashes are remembered against the file size and modification
+        # time so that unchanged files do not need to be re-read to be hashed
+        self._index_path = os.path.join(cache_dir, "hashes.json")
+        self._hashes = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "r") as f:
+                self._hashes = json.load(f)
+
+    def file_hash(self, path: str) -> str:
+        """Gets the sha256 hash of the contents of the file at the given path"""
+        stat = os.stat(path)
+        known = self._hashes.get(path)
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+
+        self._hashes[path] = [stat.st_size, stat.st_mtime_ns, sha.hexdigest()]
+        with open(self._index_path, "w") as f:
+            json.dump(self._hashes, f)
+
+        return sha.hexdigest()
+
+    def key(self, meta, trace_dir: str = None, lazy: bool = False) -> str:
+        """Gets the cache key for the manifest row, loaded with the given trace_dir and lazy"""
+        content = self.file_hash(os.path.join(d.BASE_PATH, meta[d.PATH]))
+        row = json.dumps(list(meta))
+        traces = "memory" if trace_dir is None else f"mmap:{os.path.abspath(trace_dir)}"
+        return hashlib.sha256(
+            f"{content}|{row}|{traces}|{lazy}|{d.ANALYSIS_VERSION}".encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._dir, f"{key}.pickle.gz")
+
+    def _traces_record_path(self, key: str) -> str:
+        return os.path.join(self._dir, f"{key}.traces")
+
+    def _entries(self) -> List[str]:
+        return [x[:-len(".pickle.gz")] for x in os.listdir(self._dir) if x.endswith(".pickle.gz")]
+
+    def _traces_of(self, key: str) -> Optional[str]:
+        """Gets the memory mapped trace file used by the entry with the given key, if any"""
+        path = self._traces_record_path(key)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "r") as f:
+            return f.read()
+
+    def _remove(self, keys: Sequence[str]):
+        """
+        Removes the entries with the given keys, and any of their trace files
+        which are not used by a remaining entry
+        """
+        traces = {self._traces_of(x) for x in keys} - {None}
+
+        for key in keys:
+            os.remove(self._entry_path(key))
+            if os.path.exists(self._traces_record_path(key)):
+                os.remove(self._traces_record_path(key))
+
+        traces -= {self._traces_of(x) for x in self._entries()}
+        for path in traces:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def get(self, meta, trace_dir: str = None, lazy: bool = False) -> Optional[FileData]:
+        """
+        Gets the cached FileData for the manifest row, or None if it is not cached.
+        An entry whose memory mapped traces have since been deleted is not used.
+        """
+        try:
+            path = self._entry_path(self.key(meta, trace_dir, lazy))
+        except OSError:
+            return None
+
+        if not os.path.exists(path):
+            return None
+
+        with gzip.GzipFile(path, "r") as f:
+            data = pickle.load(f)
+
+        # pylint: disable=protected-access
+        if data._traces_path is not None and not os.path.exists(data._traces_path):
+            return None
+
+        return data
+
+    def put(self, meta, data: FileData, trace_dir: str = None, lazy: bool = False):
+        """Stores the FileData for the manifest row, loaded with the given trace_dir and lazy"""
+        key = self.key(meta, trace_dir, lazy)
+        path = self._entry_path(key)
+
+        # the lowest compression is several times faster than the default, and
+        # the entries are almost the same size
+        with gzip.GzipFile(f"{path}.tmp", "w", compresslevel=1) as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+
+        # pylint: disable=protected-access
+        if data._traces_path is not None:
+            with open(self._traces_record_path(key), "w") as f:
+                f.write(os.path.abspath(data._traces_path))
+
+        os.replace(f"{path}.tmp", path)
+
+    def invalidate(self, meta, trace_dir: str = None, lazy: bool = False) -> bool:
+        """
+        Removes the cached entry for the given manifest row, loaded with the given
+        trace_dir and lazy. Returns True if an entry was removed
+        """
+        try:
+            key = self.key(meta, trace_dir, lazy)
+        except OSError:
+            return False
+
+        if not os.path.exists(self._entry_path(key)):
+            return False
+
+        self._remove([key])
+        return True
+
+    def evict(self, keep: Sequence[list], trace_dir: str = None, lazy: bool = False) -> int:
+        """
+        Removes every cached entry which is not the current entry for one of the
+        given manifest rows, e.g. `cache.evict(FILES)` removes entries for files
+        which are no longer in the manifest or have been changed. Only entries
+        loaded with the given trace_dir and lazy are kept.
+        Returns the number of entries removed
+        """
+        keys = set()
+        for meta in keep:
+            try:
+                keys.add(self.key(meta, trace_dir, lazy))
+            except OSError:
+                pass
+
+        stale = [x for x in self._entries() if x not in keys]
+        self._remove(stale)
+
+        return len(stale)
+
+    def clear(self):
+        """Removes all cached entries and their trace files"""
+        self._remove(self._entries())
+
+
+def _load_file(
+        meta,
+        trace_dir: str = None,
+        lazy: bool = False,
+        base_path: str = None,
+        cache: FileDataCache = None
+) -> LoadResult:
+    """
+    Loads a single row of the file manifest. Any exception raised while
+    loading is captured in the result rather than propagated.
+
+    If base_path is given it replaces d.BASE_PATH, as spawned worker processes
+    re-import the definitions rather than inheriting any change made to them.
+
+    If a cache is given the loaded FileData is stored in it, so that each
+    worker process writes its own cache entries in parallel.
+    """
+    if base_path is not None:
+        d.BASE_PATH = base_path
+
+    with profiling.for_file(meta[d.PATH]):
+        try:
+            data = FileData(meta, trace_dir, lazy)
+        except Exception: # pylint: disable=broad-except
+            return LoadResult(meta, None, traceback.format_exc())
+
+        if cache is not None:
+            with profiling.stage("cache_put"):
+                cache.put(meta, data, trace_dir, lazy)
+
+    return LoadResult(meta, data, None)
+
+
+def load_all(
+        metas: Sequence[list],
+        workers: int = 1,
+        cache: FileDataCache = None,
+        trace_dir: str = None,
+        lazy: bool = False
+) -> List[LoadResult]:
+    """
+    Loads every row in the given file manifest (e.g. FILES), spreading the
+    file parsing and per-run analysis over a pool of `workers` processes.
+    If workers is 1 the files are loaded serially in this process, if it is
+    None one process is used per CPU.
+
+    If a cache is given, files with a valid cache entry are loaded from the
+    cache and only the remaining files are analysed (and then cached, by the
+    process that analysed them).
+
+    If a trace_dir is given, each file's sweeps are memory mapped from that
+    directory rather than being held in memory, and if lazy is True the
+    time constants of each run are only calculated when first accessed
+    (see FileData).
+
+    A file that fails to load does not stop the batch, instead its traceback
+    is stored in the `error` field of its result.
+
+    Worker processes import this module to load each file, so if it has been
+    %run into __main__ rather than imported, and workers are spawned rather
+    than forked (e.g. on Windows), the files are loaded serially instead.
+
+    If profiling is enabled, the time taken by each stage of loading each
+    file is collected, including in the worker processes (see profiling).
+
+    Returns: a LoadResult(meta, data, error) per manifest row, in manifest order
+    """
+    results: List[LoadResult] = [None] * len(metas)
+    pending = []
+
+    for i, meta in enumerate(metas):
+        cached = None if cache is None else cache.get(meta, trace_dir, lazy)
+        if cached is None:
+            pending.append(i)
+        else:
+            results[i] = LoadResult(meta, cached, None)
+
+    load_file = partial(
+        _load_file, trace_dir=trace_dir, lazy=lazy, base_path=d.BASE_PATH, cache=cache)
+
+    if workers != 1 and _load_file.__module__ == "__main__" \
+            and multiprocessing.get_start_method() != "fork":
+        print("load_all must be imported (not %run) to use worker processes, loading serially")
+        workers = 1
+
+    if workers == 1:
+        loaded = [load_file(metas[i]) for i in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            loaded = profiling.map_profiled(pool, load_file, [metas[i] for i in pending])
+
+    for i, result in zip(pending, loaded):
+        results[i] = result
+
+    return results
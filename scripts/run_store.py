@@ -0,0 +1,149 @@
+r"""
+A columnar on-disk store for analysed costimulation runs.
+
+The store is a directory holding:
+ - features.npz: one column per scalar feature, one row per run
+ - traces.npy: every run's membrane voltage trace (V) in one contiguous float32 block
+ - trace_offsets.npy: the start of each run's trace within traces.npy (plus the end
+   of the final trace), so run i is traces[offsets[i]:offsets[i + 1]]
+
+Scalar features can be filtered and aggregated (e.g. with `RunStore.to_df`)
+without loading any trace data, as the traces are memory mapped on read.
+"""
+
+import os
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+import definitions as d
+from file_data import FileData
+
+FEATURES_FILE = "features.npz"
+TRACES_FILE = "traces.npy"
+OFFSETS_FILE = "trace_offsets.npy"
+
+# the FileData.columns stored under a different name in the run store
+RENAMED = {"optical_aps": "opt_aps"}
+
+# the dtype of each stored column, any other column is float64
+DTYPES = {
+    "cell": np.int32,
+    "optical_threshold": np.int32,
+    "opt_bucket": np.int32,
+    "electrical_threshold": np.int32,
+    "elec_bucket": np.int32,
+    "offset": np.int32,
+    "costim_aps": bool,
+    "elec_aps": bool,
+    "opt_aps": bool,
+}
+
+# the run column prefix for each stimulus mode, in the order of CostimulationRun.time_constants
+MODES = ["costim", "elec", "opt"]
+
+
+def run_features(file: FileData, file_idx: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Gathers the scalar features of every run in the given file into columns,
+    i.e. FileData.columns plus the file index, protocol and average dV/dt of
+    each stimulus. Time constants are in ms and voltages in mV.
+    """
+    num = len(file.runs)
+
+    columns = {
+        "file_idx": np.full(num, file_idx, dtype=np.int32),
+        "protocol_id": np.full(num, file.protocol.protocol_id, dtype=np.int32),
+    }
+
+    for name, values in file.columns().items():
+        name = RENAMED.get(name, name)
+        columns[name] = values if name == "run" else values.astype(DTYPES.get(name, np.float64))
+
+    dvdt_avg = np.array([
+        [np.nan if x.derivative is None else x.derivative.dvdt_avg for x in run.time_constants]
+        for run in file.runs
+    ], dtype=np.float64).reshape(num, len(MODES))
+
+    for j, prefix in enumerate(MODES):
+        columns[f"{prefix}_dvdt_avg"] = dvdt_avg[:, j]
+
+    return columns
+
+
+def write_run_store(files: Sequence[FileData], path: str):
+    """
+    Writes the runs of the given FileData objects to a columnar store in the
+    directory at the given path
+    """
+    os.makedirs(path, exist_ok=True)
+
+    runs = [run for file in files for run in file.runs]
+    lengths = np.array([len(x.data) for x in runs], dtype=np.int64)
+    offsets = np.zeros(len(runs) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    # each run's trace is written straight to the memory mapped file, so the
+    # traces never need to be held in memory at once
+    traces_path = os.path.join(path, TRACES_FILE)
+    if offsets[-1] == 0:
+        np.save(traces_path, np.empty(0, dtype=np.float32)) # an empty file can't be memory mapped
+    else:
+        traces = np.lib.format.open_memmap(
+            traces_path, mode="w+", dtype=np.float32, shape=(offsets[-1],))
+        for i, run in enumerate(runs):
+            traces[offsets[i]:offsets[i + 1]] = run.data
+        traces.flush()
+        del traces
+
+    per_file = [run_features(x, i) for i, x in enumerate(files)]
+    columns = {
+        k: np.concatenate([x[k] for x in per_file]) for k in per_file[0]
+    } if per_file else {}
+
+    np.savez(os.path.join(path, FEATURES_FILE), **columns)
+    np.save(os.path.join(path, OFFSETS_FILE), offsets)
+
+
+class RunStore(object):
+    """
+    Reads a columnar run store written by `write_run_store`
+    """
+
+    features: Dict[str, np.ndarray]
+
+    _traces: np.ndarray
+    _offsets: np.ndarray
+
+    def __init__(self, path: str):
+        with np.load(os.path.join(path, FEATURES_FILE)) as features:
+            self.features = {k: features[k] for k in features.files}
+
+        self._traces = np.load(os.path.join(path, TRACES_FILE), mmap_mode="r")
+        self._offsets = np.load(os.path.join(path, OFFSETS_FILE))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def to_df(self) -> "pandas.DataFrame":
+        """Converts the scalar run features to a pandas dataframe, one row per run"""
+        import pandas as pd # pylint: disable=import-outside-toplevel
+        return pd.DataFrame(self.features)
+
+    def trace(self, idx: int, stimulus: str = None) -> np.ndarray:
+        """
+        Gets the membrane voltage trace (V) for the run at the given index. If a
+        stimulus is given (i.e. "costim", "electrical", "optical") only the data
+        for that stimulus is returned, as in CostimulationRun.costim_data etc.
+        """
+        data = self._traces[self._offsets[idx]:self._offsets[idx + 1]]
+
+        if stimulus is None:
+            return data
+
+        protocol = d.PARAMS[self.features["protocol_id"][idx]]
+        return data[protocol.get_data_slice(stimulus)]
+
+    def traces(self, idxs: Sequence[int], stimulus: str = None) -> List[np.ndarray]:
+        """Gets the traces for the runs at the given indices"""
+        return [self.trace(i, stimulus) for i in idxs]
@@ -0,0 +1,132 @@
+r"""
+Describes the peaks in the single stimulus files (OPT_ONLY_FILES, ELEC_ONLY_FILES
+and FAKE_COSTIM_FILES), which are compared to costimulation when characterising
+sub- / suprathreshold time constants. Used for the time constant table in the
+main notebook and by batch.py.
+"""
+
+import os
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Sequence
+
+import numpy as np
+import quantities as q
+
+import definitions as d
+from file_data import LoadResult
+from sgn import profiling
+from sgn.sweeps import SweepReader
+from sgn.time_constants import TimeConstants
+
+SAMPLES_TO_MS = 1000. / 50000.
+
+# Describes how one kind of single stimulus file is analysed:
+#  - labels: the (subthreshold, suprathreshold) label of each peak
+#  - stride: only the first of every `stride` columns is a membrane voltage
+#  - window: the samples around the stimulus
+#  - check_hold: skip sweeps with a holding potential outside of -70 to -50mV
+#  - aps_only: skip sweeps without a single AP
+#  - cell: the index of the cell in the manifest row
+SingleStimulus = namedtuple(
+    'SingleStimulus',
+    'labels stride window check_hold aps_only cell')
+
+KINDS = {
+    "optical": SingleStimulus(("sub_o", "sup_o"), 3, np.s_[39000:50000], False, False, 1),
+    "electrical": SingleStimulus(("sub_e", "sup_e"), 2, np.s_[19000:25000], True, False, 4),
+    "fake_costim": SingleStimulus(("all_elec", "all_elec"), 3, np.s_[24000:35000], True, True, 1),
+}
+
+# the columns of each described peak
+COLUMNS = ["path", "cell", "type", "tau_on", "tau_off", "amplitude", "width", "dvdt_avg"]
+
+
+def _magnitude(value) -> float:
+    """Gets the magnitude of a quantity or plain number"""
+    return float(getattr(value, "magnitude", value))
+
+
+def describe_file(kind: str, meta: list) -> List[dict]:
+    """
+    Describes the first peak in each sweep of the given manifest row, for the
+    given kind of file (see KINDS). Returns one dict per peak, with COLUMNS
+    """
+    spec = KINDS[kind]
+    path = os.path.join(d.BASE_PATH, meta[d.PATH])
+
+    with profiling.stage("read"):
+        sweeps = SweepReader(path)
+
+    rows = []
+    for idx, raw in sweeps:
+        if (idx - 1) % spec.stride != 0:
+            continue
+
+        if spec.check_hold:
+            initial = np.mean(raw[:1000])
+            if initial < -0.07 or initial > -0.05:
+                continue
+
+        data = raw[spec.window]
+        if spec.aps_only and np.max(data) < -0.02:
+            continue
+
+        with profiling.stage("describe_peaks"):
+            peaks = TimeConstants.describe_peaks(data)
+
+        if len(peaks) == 0 or (spec.aps_only and len(peaks) != 1):
+            continue
+
+        constants = TimeConstants(peaks[0], SAMPLES_TO_MS / 1000, 1000)
+        with profiling.stage("get_derivative"):
+            derivative = TimeConstants.get_derivative(data, 2e-5 * q.second, 30, SAMPLES_TO_MS)
+
+        rows.append({
+            "path": meta[d.PATH],
+            "cell": meta[spec.cell],
+            "type": spec.labels[1 if data[peaks[0]['peak']] > -0.02 else 0],
+            "tau_on": _magnitude(constants.on_tau),
+            "tau_off": _magnitude(constants.off_tau),
+            "amplitude": peaks[0]['max'] * 1000,
+            "width": peaks[0]['0mv_duration'] * SAMPLES_TO_MS,
+            "dvdt_avg": 0 if derivative is None else derivative.dvdt_avg,
+        })
+
+    return rows
+
+
+def _describe_file(kind: str, meta: list, base_path: str = None) -> LoadResult:
+    """
+    Describes a single row of the manifest, see describe_file. Any exception
+    raised is captured in the result rather than propagated.
+
+    If base_path is given it replaces d.BASE_PATH, as for file_data._load_file
+    """
+    if base_path is not None:
+        d.BASE_PATH = base_path
+
+    with profiling.for_file(meta[d.PATH]):
+        try:
+            return LoadResult(meta, describe_file(kind, meta), None)
+        except Exception: # pylint: disable=broad-except
+            return LoadResult(meta, None, traceback.format_exc())
+
+
+def describe_all(kind: str, metas: Sequence[list], workers: int = 1) -> List[LoadResult]:
+    """
+    Describes every row in the given manifest (e.g. OPT_ONLY_FILES with kind
+    "optical"), spreading the files over `workers` processes as for load_all.
+
+    Returns: a LoadResult(meta, data, error) per manifest row, in manifest order,
+    where the data is the list of peaks described by describe_file
+    """
+    describe = partial(_describe_file, kind, base_path=d.BASE_PATH)
+
+    if workers == 1:
+        return [describe(x) for x in metas]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return profiling.map_profiled(pool, describe, metas)
@@ -0,0 +1,20 @@
+r"""
+The import / analysis code shared by the costimulation (scripts/) and pulse
+train (pulse_trains/scripts/) analyses:
+
+ - sweeps: streaming access to the sweeps of an axograph file
+ - peaks: the peak finding and description used by both analyses
+ - time_constants, costimulation_run, protocol: single pulse costimulation runs
+ - pulse_train_run: pulse train runs
+ - profiling: optional timing of each stage of the analysis
+ - buckets: grouping of thresholds / powers into fixed width buckets
+ - constants: definitions common to both experiments, e.g. the junction potential
+
+Each analysis keeps its own manifest (files.py), manifest indices
+(definitions.py) and file importer (file_data.py). The repository root must
+be on the path, e.g. by running the notebooks from it.
+
+Plotting (matplotlib / seaborn) and pandas are only imported inside the
+methods that plot or export dataframes, here and in each file importer, so
+the import and analysis can run headless (see batch.py).
+"""
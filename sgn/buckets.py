@@ -0,0 +1,24 @@
+r"""
+Groups values (e.g. stimulus thresholds or powers) into buckets of a fixed width
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+# the rounding used to find each value's bucket, "round" rounds half to even
+# as for python's round
+ROUNDING = {
+    "round": np.round,
+    "floor": np.floor,
+}
+
+
+def buckets(values: Sequence[float], width: int, rounding: str = "round") -> np.ndarray:
+    """
+    Converts every value into a bucketed value at once, i.e. the multiple of
+    width nearest to (with "round") or below (with "floor") the value. A single
+    value gives a 0-d array, so `int(buckets(value, width))` buckets one value.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return (width * ROUNDING[rounding](values / width)).astype(np.int64)
@@ -0,0 +1,8 @@
+r"""
+Gives the definitions common to both the costimulation and pulse train experiments
+"""
+
+# The liquid junction potential, which is added to every recorded membrane
+# voltage. The costimulation analysis works in V and the pulse train analysis in mV
+JNC_POT_MV = -12.8
+JNC_POT = JNC_POT_MV / 1000.
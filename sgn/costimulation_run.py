@@ -0,0 +1,314 @@
+r"""
+Defines a "CostimulationRun" object, which contains information
+about a single costimulation run.
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import quantities as q
+
+from sgn import profiling
+from sgn.constants import JNC_POT
+from sgn.protocol import Protocol
+from sgn.time_constants import TimeConstants
+
+class CostimulationRun(object):
+    """
+    Represents a single costimulation run, including three pulses - combined,
+    electrical only, optical only.
+
+    Gathers data about particular runs including latency, AP detection, pulse peaks, etc
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    # there are thousands of runs, so avoid a __dict__ per run, and hold the
+    # maxima as floats rather than quantities. opt_bucket and elec_bucket are
+    # not set here, but are assigned by the analysis notebooks
+    __slots__ = (
+        "file_data",
+        "protocol_id",
+        "offset",
+        "period",
+        "_sample_period",
+        "cell",
+        "v_rest",
+        "_costim_max",
+        "_elec_max",
+        "_opt_max",
+        "elec_thresh",
+        "opt_thresh",
+        "opt_bucket",
+        "elec_bucket",
+        "costim_aps",
+        "elec_aps",
+        "opt_aps",
+        "c_ton",
+        "c_toff",
+        "e_ton",
+        "e_toff",
+        "o_ton",
+        "o_toff",
+        "_data",
+        "_row",
+        "_time_constants",
+    )
+
+    protocol_id: int
+    offset: int
+    period: q.UnitTime
+    _sample_period: float
+
+    v_rest: float
+    # snr: float
+    # the maxima in mV, see costim_max etc
+    _costim_max: float
+    _elec_max: float
+    _opt_max: float
+
+    elec_thresh: float
+    opt_thresh: float
+
+    costim_aps: bool
+    elec_aps: bool
+    opt_aps: bool
+
+    # the run's data is either held by the run, or is row _row of the
+    # file's memory mapped traces (see FileData.traces)
+    _data: np.ndarray
+    _row: int
+
+    # the (costim, electrical, optical) time constants, None until calculated in lazy mode
+    _time_constants: Tuple[TimeConstants, TimeConstants, TimeConstants]
+
+    # As per e.g. https://github.com/swharden/SWHLab/blob/master/swhlab/analysis/ap.py
+    # an AP is where the derivative of the signal exceeds this threshold, i.e. 20mV / ms
+    _ap_detection_threshold: float = 100 * (q.mV / q.ms)
+
+    def __init__(
+            self,
+            file_data: "FileData",
+            protocol: Protocol,
+            data: Sequence[float],
+            offset: int,
+            elec_thresh: float,
+            opt_thresh: float,
+            cell: int,
+            row: int = None,
+            aps: Tuple[bool, bool, bool] = None,
+            time_constants: Tuple[TimeConstants, TimeConstants, TimeConstants] = None,
+            lazy: bool = False
+    ):
+        """
+        Initialises the run with the output data recorded by axograph.
+
+        If row is given the data is not kept by the run, and is instead read
+        on demand from that row of the file's memory mapped traces.
+
+        If aps is given it is used as the (costim, electrical, optical) AP
+        detection result, e.g. from the batch FileData.detect_aps, otherwise
+        APs are detected for this run.
+
+        Similarly if time_constants is given it is used as the (costim, electrical,
+        optical) time constants, e.g. from TimeConstants.describe_batch, otherwise
+        they are calculated for this run. If lazy is True they are only
+        calculated when one of the *_time_constants attributes is first accessed.
+        """
+
+        # print(" --> OFFSET %s" % (offset))
+
+        self.file_data = file_data
+        with profiling.stage("jnc_correction"):
+            data = np.array(data) + JNC_POT
+        self._row = row
+        self._data = data if row is None else None
+        self.offset = offset
+        self.period = protocol.period
+        self._sample_period = protocol.sample_period
+        self.protocol_id = protocol.protocol_id
+        self.elec_thresh = elec_thresh
+        self.opt_thresh = opt_thresh
+        self.cell = cell
+
+        self.v_rest = np.mean(data[0:1000]) * 1000 # to mV
+        # self.snr = -self.v_rest / (np.std(data[0:1000]) * 1000)
+        slices = protocol.index.slices
+        costim_data = data[slices["costim"]]
+        elec_data = data[slices["electrical"]]
+        opt_data = data[slices["optical"]]
+
+        self._costim_max = np.max(costim_data) * 1000
+        self._elec_max = np.max(elec_data) * 1000
+        self._opt_max = np.max(opt_data) * 1000
+
+        if aps is None:
+            with profiling.stage("detect_aps"):
+                aps = (
+                    self.detect_aps(costim_data),
+                    self.detect_aps(elec_data),
+                    self.detect_aps(opt_data)
+                )
+
+        (self.costim_aps, self.elec_aps, self.opt_aps) = aps
+
+        # alternative method to calculate t_on / t_off based on curve fitting
+        # could be expensive, lets see!
+        self.c_ton = 0
+        self.c_toff = 0
+        self.e_ton = 0
+        self.e_toff = 0
+        self.o_ton = 0
+        self.o_toff = 0
+
+        self._time_constants = time_constants
+        if time_constants is None and not lazy:
+            self._time_constants = self._calculate_time_constants(costim_data, elec_data, opt_data)
+
+    def _calculate_time_constants(
+            self,
+            costim_data: np.ndarray,
+            elec_data: np.ndarray,
+            opt_data: np.ndarray
+    ) -> Tuple[TimeConstants, TimeConstants, TimeConstants]:
+        """Calculates the (costim, electrical, optical) time constants for this run"""
+        protocol = self.file_data.protocol
+
+        # In theory could do all at once here, but then if there aren't
+        # three peaks would need to allocate the peaks to the correct
+        # stimulation mode. This way we can be certain the peak is at
+        # least "close" to the stimulation mode
+        with profiling.stage("describe_peaks"):
+            c_peaks = TimeConstants.describe_peaks(costim_data) + [None]
+            e_peaks = TimeConstants.describe_peaks(elec_data) + [None]
+            o_peaks = TimeConstants.describe_peaks(opt_data) + [None]
+
+        with profiling.stage("get_derivative"):
+            derivatives = [
+                TimeConstants.get_derivative(x, self.period, 25, 1000. / 50000.)
+                for x in (costim_data, elec_data, opt_data)
+            ]
+
+        return (
+            TimeConstants(
+                c_peaks[0],
+                self.period,
+                protocol.get_onset("costim", self.offset),
+                derivatives[0]),
+            TimeConstants(
+                e_peaks[0],
+                self.period,
+                protocol.get_onset("electrical", 0),
+                derivatives[1]),
+            TimeConstants(
+                o_peaks[0],
+                self.period,
+                protocol.get_onset("optical", 0),
+                derivatives[2])
+        )
+
+    def _get_time_constants(self) -> Tuple[TimeConstants, TimeConstants, TimeConstants]:
+        """Gets the time constants, calculating them on first access in lazy mode"""
+        if self._time_constants is None:
+            self._time_constants = self._calculate_time_constants(
+                self.costim_data, self.elec_data, self.opt_data)
+
+        return self._time_constants
+
+    @property
+    def maxima_mv(self) -> Tuple[float, float, float]:
+        """The (costim, electrical, optical) maximum membrane voltages in mV, as floats"""
+        return (self._costim_max, self._elec_max, self._opt_max)
+
+    @property
+    def time_constants(self) -> Tuple[TimeConstants, TimeConstants, TimeConstants]:
+        """The (costim, electrical, optical) time constants"""
+        return self._get_time_constants()
+
+    @property
+    def costim_max(self) -> q.Quantity:
+        """The maximum membrane voltage around the costimulation pulse"""
+        return q.Quantity(self._costim_max, q.millivolt)
+
+    @property
+    def elec_max(self) -> q.Quantity:
+        """The maximum membrane voltage around the electrical pulse"""
+        return q.Quantity(self._elec_max, q.millivolt)
+
+    @property
+    def opt_max(self) -> q.Quantity:
+        """The maximum membrane voltage around the optical pulse"""
+        return q.Quantity(self._opt_max, q.millivolt)
+
+    @property
+    def costim_time_constants(self) -> TimeConstants:
+        """The time constants of the first peak in the costimulation data"""
+        return self._get_time_constants()[0]
+
+    @property
+    def elec_time_constants(self) -> TimeConstants:
+        """The time constants of the first peak in the electrical data"""
+        return self._get_time_constants()[1]
+
+    @property
+    def opt_time_constants(self) -> TimeConstants:
+        """The time constants of the first peak in the optical data"""
+        return self._get_time_constants()[2]
+
+    def _window(self, stimulus: str) -> np.ndarray:
+        """Gets the data for the given stimulus, reading it from the memory mapped traces if required"""
+        data_slice = self.file_data.protocol.index.slices[stimulus]
+
+        if self._row is None:
+            return self._data[data_slice]
+
+        return self.file_data.traces[self._row, data_slice] + JNC_POT
+
+    @property
+    def data(self) -> np.ndarray:
+        """The membrane voltage for the whole run (V), corrected for junction potential"""
+        if self._row is None:
+            return self._data
+
+        return self.file_data.traces[self._row] + JNC_POT
+
+    @property
+    def costim_data(self) -> np.ndarray:
+        """The data around the costimulation pulse"""
+        return self._window("costim")
+
+    @property
+    def elec_data(self) -> np.ndarray:
+        """The data around the electrical pulse"""
+        return self._window("electrical")
+
+    @property
+    def opt_data(self) -> np.ndarray:
+        """The data around the optical pulse"""
+        return self._window("optical")
+
+    def get_derivative(self, data: Sequence[float]) -> List[float]:
+        """
+        Calculates and returns the point by point derivative for the given sequence
+        REF: https://github.com/swharden/SWHLab/blob/master/swhlab/analysis/ap.py
+        NOTE: memoize?
+
+        Returns the value in V/s
+        """
+        return np.append([0], (data[1:] - data[:-1]) / self._sample_period)
+
+    def detect_aps(self, data: Sequence[float]) -> bool:
+        """
+        Detects whether the gradient within the data exceeds the threshold gradient
+        """
+        # the derivative is in V/s, which is numerically the same as mV/ms
+        max_d = np.max(self.get_derivative(data))
+
+        return max_d >= self._ap_detection_threshold.magnitude
+
+    def plot(self, time_shift=0, **kwargs):
+        """Plots this run"""
+        import matplotlib.pyplot as plt # pylint: disable=import-outside-toplevel
+
+        plt.plot([x * 1000. - time_shift for x in self.file_data.times], self.data * 1000, **kwargs)
+        plt.xlabel("Time (ms)")
+        plt.ylabel("Membrane Voltage (mV)")
@@ -0,0 +1,120 @@
+r"""
+Finds and measures the peaks in a membrane voltage trace. Used to describe the
+single pulse costimulation peaks (TimeConstants) and the pulse train peaks
+(PulseTrainRun), which differ in their thresholds and units but share the
+peak finding and the searches around each peak.
+"""
+
+import math
+from collections import namedtuple
+from typing import Sequence
+
+import numpy as np
+from scipy.signal import find_peaks, peak_widths
+
+# the minimum width of a peak in samples
+MIN_WIDTH = 50
+
+# The peaks found in a trace:
+#  - peaks: the index of each peak
+#  - left_ips / right_ips: the interpolated indices where each peak crosses half its prominence
+#  - on / off: the first index where each peak has risen above / fallen below the
+#    on / off relative height (see locate_peaks)
+PeakLocations = namedtuple('PeakLocations', 'peaks left_ips right_ips on off')
+
+
+def locate_peaks(
+        data: Sequence[float],
+        height: float,
+        distance: int,
+        on_rel_height: float,
+        off_rel_height: float,
+        expected: int = None) -> PeakLocations:
+    """
+    Finds the peaks in the data at least height high, distance samples apart
+    and MIN_WIDTH samples wide. The on (off) index of each peak is where its
+    rising (falling) edge crosses on_rel_height (off_rel_height) of its
+    prominence below the maximum, rounded up.
+
+    If expected is provided and a different number of peaks is found, raise an exception
+    """
+    peaks, peak_data = find_peaks(data, distance=distance, height=height, width=MIN_WIDTH)
+
+    if (expected is not None) and (len(peaks) != expected):
+        raise Exception(
+            f"Expected {expected} peaks in calculate_time_constants but found {len(peaks)}")
+
+    return PeakLocations(
+        peaks,
+        peak_data['left_ips'],
+        peak_data['right_ips'],
+        [math.ceil(x) for x in peak_widths(data, peaks, rel_height=on_rel_height)[2]],
+        [math.ceil(x) for x in peak_widths(data, peaks, rel_height=off_rel_height)[3]])
+
+
+def find_last_idx(
+        mask: np.ndarray,
+        peaks: Sequence[int],
+        rows: Sequence[int] = None) -> np.ndarray:
+    """
+    For each peak index, returns the last index at or before the peak where the
+    mask is true, or 0 if there is no such index (index 0 is never considered).
+
+    The mask may be 2D with one trace per row, in which case rows gives the
+    row of each peak.
+    """
+
+    mask = np.atleast_2d(mask)
+    width = mask.shape[1]
+    peaks = np.asarray(peaks, dtype=np.intp)
+    starts = width * (np.zeros_like(peaks) if rows is None else np.asarray(rows, dtype=np.intp))
+
+    candidates = np.flatnonzero(mask)
+    candidates = candidates[candidates % width != 0]
+    if len(candidates) == 0:
+        return np.zeros(len(peaks), dtype=np.intp)
+
+    positions = np.searchsorted(candidates, starts + peaks, side="right") - 1
+    found = candidates[np.clip(positions, 0, None)] - starts
+
+    return np.where((positions >= 0) & (found >= 0), found, 0)
+
+
+def find_width(
+        data: np.ndarray,
+        peaks: Sequence[int],
+        level: float,
+        rows: Sequence[int] = None) -> np.ndarray:
+    """
+    Given some data and peak indices, find the left and right boundaries
+    where the signal dips below the given level. Used for finding the 0mV
+    width of a peak.
+
+    The search moves outwards from each peak by at most (peak - 1) samples in
+    each direction, and never considers index 0. If either boundary is not
+    found the width is -1.
+
+    The data may be 2D with one trace per row, in which case rows gives the
+    row of each peak.
+    """
+
+    data = np.atleast_2d(data)
+    width = data.shape[1]
+    peaks = np.asarray(peaks, dtype=np.intp)
+    starts = width * (np.zeros_like(peaks) if rows is None else np.asarray(rows, dtype=np.intp))
+
+    below = np.flatnonzero(data < level)
+    if len(below) == 0:
+        return np.full(len(peaks), -1, dtype=np.intp)
+
+    # the first index below the level after the peak, and the last one before it
+    right_pos = np.searchsorted(below, starts + peaks, side="right")
+    left_pos = np.searchsorted(below, starts + peaks, side="left") - 1
+
+    right = below[np.clip(right_pos, 0, len(below) - 1)] - starts
+    left = below[np.clip(left_pos, 0, len(below) - 1)] - starts
+
+    found = (right_pos < len(below)) & (right < width) & (right - peaks <= peaks - 1) & \
+        (left_pos >= 0) & (left >= 1)
+
+    return np.where(found, right - left, -1)
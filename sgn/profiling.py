@@ -0,0 +1,264 @@
+r"""
+Optional timing instrumentation for the stages of the import / analysis process.
+
+Stages are timed with context managers, e.g.
+
+    with profiling.stage("detect_aps"):
+        ...
+
+and attributed to the file currently being processed (see `profiling.for_file`).
+Profiling is disabled by default, in which case `stage` returns a shared
+context manager which does nothing, so instrumented code runs at (almost)
+full speed. To profile a session:
+
+    from sgn import profiling
+
+    profiling.enable()
+    results = load_all(FILES, workers=None)
+    print(profiling.format_report(per_file=True))
+
+Both the costimulation and pulse train analyses record to the same profiler.
+
+A different Profiler (e.g. one which forwards each timing elsewhere by
+overriding `record`) can be installed with `set_profiler`.
+"""
+
+import time
+from collections import defaultdict
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# the file which stages are attributed to outside of any `for_file` context
+NO_FILE = "-"
+
+# the percentiles given in each report row
+PERCENTILES = (50, 90, 99)
+
+
+class _NullContext(object):
+    """The context used while profiling is disabled, which does nothing"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class _Stage(object):
+    """Times a single stage, recording it with the profiler on exit"""
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self._profiler = profiler
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._profiler.record(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class _File(_Stage):
+    """Attributes the stages within it to a file, and times the file in total"""
+    __slots__ = ("_path",)
+
+    def __init__(self, profiler: "Profiler", path: str):
+        super().__init__(profiler, "total")
+        self._path = path
+
+    def __enter__(self):
+        self._profiler.files.append(self._path)
+        return super().__enter__()
+
+    def __exit__(self, *args):
+        super().__exit__(*args)
+        self._profiler.files.pop()
+        return False
+
+
+class Profiler(object):
+    """
+    Collects the duration of each call to each stage, and the value of each
+    counter, by file
+    """
+
+    enabled: bool
+
+    # the stack of files being processed, the last is the current file
+    files: List[str]
+
+    _timings: Dict[Tuple[str, str], List[float]]
+    _counts: Dict[Tuple[str, str], int]
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.files = []
+        self._timings = defaultdict(list)
+        self._counts = defaultdict(int)
+
+    def current_file(self) -> str:
+        """The file that stages are currently attributed to"""
+        return self.files[-1] if self.files else NO_FILE
+
+    def stage(self, name: str):
+        """A context manager which times the named stage"""
+        return _Stage(self, name) if self.enabled else _NULL_CONTEXT
+
+    def for_file(self, path: str):
+        """A context manager which attributes the stages within it to the given file"""
+        return _File(self, path) if self.enabled else _NULL_CONTEXT
+
+    def count(self, name: str, value: int = 1):
+        """Adds the value to the named counter"""
+        if self.enabled:
+            self._counts[(self.current_file(), name)] += value
+
+    def record(self, name: str, seconds: float):
+        """Records one call to the named stage, taking the given time"""
+        self._timings[(self.current_file(), name)].append(seconds)
+
+    def merge(self, other: "Profiler"):
+        """Adds the timings and counters collected by another profiler, e.g. in a worker process"""
+        for key, timings in other._timings.items():
+            self._timings[key].extend(timings)
+        for key, value in other._counts.items():
+            self._counts[key] += value
+
+    def reset(self):
+        """Removes all collected timings and counters"""
+        self._timings = defaultdict(list)
+        self._counts = defaultdict(int)
+
+    def report(self) -> List[dict]:
+        """
+        Summarises the timings, with a row per file and stage followed by a row
+        per stage totalled over every file (with file None). Durations are in ms.
+        """
+        by_stage = defaultdict(list)
+        for (_, name), timings in self._timings.items():
+            by_stage[name].extend(timings)
+
+        rows = [self._summarise(path, name, timings) for (path, name), timings in self._timings.items()]
+        rows.extend(self._summarise(None, name, timings) for name, timings in by_stage.items())
+        return rows
+
+    @staticmethod
+    def _summarise(path: str, name: str, timings: List[float]) -> dict:
+        ms = np.asarray(timings) * 1000.
+        row = {
+            "file": path,
+            "stage": name,
+            "calls": len(ms),
+            "total_ms": ms.sum(),
+            "mean_ms": ms.mean(),
+        }
+        for (percentile, value) in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+            row[f"p{percentile}_ms"] = value
+        row["max_ms"] = ms.max()
+        return row
+
+    def counters(self) -> Dict[Tuple[str, str], int]:
+        """The value of each counter, by (file, counter name)"""
+        return dict(self._counts)
+
+    def format_report(self, per_file: bool = False) -> str:
+        """Formats the report as a table, with the total for each stage, and optionally each file"""
+        rows = [x for x in self.report() if per_file or x["file"] is None]
+        rows.sort(key=lambda x: (x["file"] is None, x["file"] or "", -x["total_ms"]))
+
+        columns = ["calls", "total_ms", "mean_ms"] + [f"p{x}_ms" for x in PERCENTILES] + ["max_ms"]
+        lines = [f"{'file':<32}{'stage':<20}" + "".join(f"{x:>12}" for x in columns)]
+        for row in rows:
+            path = "(all)" if row["file"] is None else row["file"][-31:]
+            lines.append(
+                f"{path:<32}{row['stage']:<20}{row['calls']:>12}"
+                + "".join(f"{row[x]:>12.3f}" for x in columns[1:]))
+
+        totals = defaultdict(int)
+        for (_, name), value in self._counts.items():
+            totals[name] += value
+        lines.extend(f"{name:<52}{value:>12}" for name, value in sorted(totals.items()))
+
+        return "\n".join(lines)
+
+
+PROFILER = Profiler()
+
+
+def set_profiler(profiler: Profiler):
+    """Installs the given profiler, used by all instrumented code from now on"""
+    global PROFILER # pylint: disable=global-statement
+    PROFILER = profiler
+
+
+def enable():
+    """Enables profiling, see also disable"""
+    PROFILER.enabled = True
+
+
+def disable():
+    """Disables profiling, keeping any timings collected so far"""
+    PROFILER.enabled = False
+
+
+def stage(name: str):
+    """A context manager which times the named stage, see Profiler.stage"""
+    return PROFILER.stage(name)
+
+
+def for_file(path: str):
+    """A context manager which attributes stages to the given file, see Profiler.for_file"""
+    return PROFILER.for_file(path)
+
+
+def count(name: str, value: int = 1):
+    """Adds the value to the named counter, see Profiler.count"""
+    PROFILER.count(name, value)
+
+
+def profiled(func: Callable, *args, **kwargs) -> tuple:
+    """
+    Calls func with a new, enabled profiler installed, e.g. in a worker process.
+    Returns the result and the profiler
+    """
+    profiler = Profiler(enabled=True)
+    set_profiler(profiler)
+    return func(*args, **kwargs), profiler
+
+
+def map_profiled(pool: "concurrent.futures.Executor", func: Callable, items: Iterable) -> list:
+    """
+    Maps func over the items using the process pool. If profiling is enabled,
+    each call is profiled in its worker (see profiled) and the profiles are
+    merged into the current profiler.
+    """
+    if not PROFILER.enabled:
+        return list(pool.map(func, items))
+
+    results = []
+    for result, profiler in pool.map(partial(profiled, func), items):
+        PROFILER.merge(profiler)
+        results.append(result)
+
+    return results
+
+
+def report() -> List[dict]:
+    """The report of the current profiler, see Profiler.report"""
+    return PROFILER.report()
+
+
+def format_report(per_file: bool = False) -> str:
+    """The formatted report of the current profiler, see Profiler.format_report"""
+    return PROFILER.format_report(per_file)
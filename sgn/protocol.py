@@ -0,0 +1,187 @@
+r"""
+EXPERIMENT PARAMETER GENERATORS
+"""
+
+import math
+from collections import namedtuple
+from types import MappingProxyType
+from typing import Dict, List
+
+import numpy as np
+import quantities as q
+
+# The indices used to analyse every sweep of a protocol, compiled once per protocol:
+#  - slices: stimulus type -> the slice of the data for that stimulus
+#  - onsets: stimulus type -> electrical offset (ms) -> onset index relative to the slice start
+#  - offsets: one cycle of electrical offsets (ms), which repeats across the sweeps
+ProtocolIndex = namedtuple('ProtocolIndex', 'slices onsets offsets')
+
+
+class Protocol(object):
+    """Describes parameters used for a given experiment"""
+
+    protocol_id: int
+    first_offset: int
+    num_offsets: int
+    delta_offset: int
+    frequency: int
+    column_count: int
+
+    durations: Dict[str, q.UnitTime] = {
+        "optical": 10 * q.millisecond,
+        "electrical": 3 * q.millisecond
+    }
+
+    onsets: Dict[str, q.UnitTime]
+
+    # the analysis runs on plain floats in seconds, the quantities above are
+    # only kept for display
+    sample_period: float
+    _onsets_s: Dict[str, float]
+    _period: q.UnitTime
+
+    index: ProtocolIndex
+
+    stim_type: List[str] = [
+        "costim",
+        "electrical",
+        "optical"
+    ]
+
+    pre_stim: q.UnitTime = 0.1 * q.second
+    post_stim: q.UnitTime = 0.3 * q.second
+    _pre_stim_s: float = 0.1
+    _post_stim_s: float = 0.3
+
+    frequency: int = 50000
+
+    def __init__(
+            self,
+            protocol_id: int,
+            first_offset: int = -3,
+            num_offsets: int = 18,
+            delta_offset: int = 1,
+            frequency: int = 50000,
+            column_count: int = 3,
+            costim_onset: float = 0.5,
+            electrical_onset: float = 1.0,
+            optical_onset: float = 1.4
+    ):
+        self.protocol_id = protocol_id
+        self.first_offset = first_offset
+        self.num_offsets = num_offsets
+        self.delta_offset = delta_offset
+        self.frequency = frequency
+        self.column_count = column_count
+
+        # the start times when the particular stimulus mode starts
+        self.onsets = {
+            "costim": costim_onset * q.second,
+            "electrical": electrical_onset * q.second,
+            "optical": optical_onset * q.second
+        }
+        self._onsets_s = {
+            "costim": costim_onset,
+            "electrical": electrical_onset,
+            "optical": optical_onset
+        }
+        self.sample_period = 1 / self.frequency
+        self._period = self.sample_period * q.second
+
+        self.index = self._compile_index()
+
+    def __getstate__(self):
+        # the index is read only, so is rebuilt rather than pickled
+        state = self.__dict__.copy()
+        del state["index"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.index = self._compile_index()
+
+    def _compile_index(self) -> ProtocolIndex:
+        """Compiles the read only index table for this protocol"""
+        offsets = np.arange(
+            self.first_offset,
+            self.first_offset + self.num_offsets * self.delta_offset,
+            self.delta_offset)
+        offsets.setflags(write=False)
+
+        slices = {
+            x: np.s_[self._calculate_start_idx(x) : self._calculate_end_idx(x)]
+            for x in self.stim_type
+        }
+
+        onsets = {
+            x: MappingProxyType({
+                offset: self._calculate_onset(x, offset) for offset in [0] + offsets.tolist()
+            }) for x in self.stim_type
+        }
+
+        return ProtocolIndex(MappingProxyType(slices), MappingProxyType(onsets), offsets)
+
+    def offsets(self, limit: int):
+        """Generates a list of time offsets for the given stride (delta ms between pulses)"""
+        return self.index.offsets.tolist() * int(math.ceil(limit / self.num_offsets))
+
+    def sweep_offsets(self, count: int) -> np.ndarray:
+        """Gets the time offset (ms) of each of the given number of sweeps"""
+        return np.resize(self.index.offsets, count)
+
+    def get_groups(self, axo):
+        """
+        Generates grouped columns based on the number of columns in the protocol.
+
+        Accepts either an axographio file, or a SweepReader in which case the
+        first sweep of each group is yielded as it is read.
+        """
+        if hasattr(axo, "data"):
+            return axo.data[1::self.column_count]
+
+        return (sweep for idx, sweep in axo if (idx - 1) % self.column_count == 0)
+
+    def group_count(self, num_columns: int) -> int:
+        """Gets the number of groups generated by get_groups for a file with the given column count"""
+        return len(range(1, num_columns, self.column_count))
+
+    @property
+    def period(self):
+        """Returns the period of the acquisition in the protocol, see also sample_period"""
+        return self._period
+
+    def get_start_idx(self, stimulus: str) -> int:
+        """Gets the start index for the data for a given stimulus"""
+        return self.index.slices[stimulus].start
+
+    def get_end_idx(self, stimulus: str) -> int:
+        """Gets the end index for the data for a given stimulus"""
+        return self.index.slices[stimulus].stop
+
+    def get_data_slice(self, stimulus: str) -> slice:
+        """Gets the slice for the data of the given stimulus type."""
+        return self.index.slices[stimulus]
+
+    def get_onset(self, stimulus: str, elec_offset: int = 0) -> int:
+        """
+        Gets the onset index of the given stimulus relative to data start.
+        Optionally includes an offset, e.g. for generating results relative to
+        the start of electrical stimulus
+        """
+        onset = self.index.onsets[stimulus].get(elec_offset)
+        if onset is None:
+            onset = self._calculate_onset(stimulus, elec_offset)
+
+        return onset
+
+    def _calculate_start_idx(self, stimulus: str) -> int:
+        return int((self._onsets_s[stimulus] - self._pre_stim_s) * self.frequency)
+
+    def _calculate_end_idx(self, stimulus: str) -> int:
+        return int((self._onsets_s[stimulus] + self._post_stim_s) * self.frequency)
+
+    def _calculate_onset(self, stimulus: str, elec_offset: int) -> float:
+        # elec_offset is in ms
+        return (
+            (self._onsets_s[stimulus] + elec_offset * 0.001) * self.frequency
+        ) - self._calculate_start_idx(stimulus)
@@ -0,0 +1,229 @@
+"""
+A class for containing run data for a single pulse frequency run
+"""
+
+import math
+from collections import namedtuple
+from typing import Sequence, TYPE_CHECKING
+
+import numpy as np
+import quantities as q
+from scipy.signal import vectorstrength
+
+from sgn import profiling
+from sgn.buckets import buckets
+from sgn.constants import JNC_POT_MV
+from sgn.peaks import locate_peaks
+
+# circular import, so type checking required this way
+if TYPE_CHECKING:
+    from file_data import FileData # pylint: disable=unused-import
+
+# the sample period in seconds
+PERIOD = 2e-5
+
+# The summary metrics of a run, calculated once when the run is created
+RunMetrics = namedtuple(
+    'RunMetrics',
+    'vector_strength vector_strength_phase adaption_ratio spike_ratio frequency')
+
+class PulseTrainRun(object):
+    """Contains data for a stimulation run looking at costimulation pulse trains"""
+
+    cell: int
+    opt_pulse_width: float
+    opt_pulse_isi: float
+    opt_pow: float
+    elec_power: float
+    elec_perc: float
+    peaks: Sequence[int]
+    metrics: RunMetrics
+
+    # the membrane voltage in mV, analysed as plain floats (see data)
+    _data: np.ndarray
+
+    # a peak is an AP where the derivative of the signal exceeds this threshold (mV / s)
+    _ap_detection_threshold: float = 100
+
+    def __init__(self,
+                 file_data: 'FileData',
+                 elec_power: float,
+                 elec_thresh: float,
+                 cell: int,
+                 data: Sequence[float]
+                ):
+        with profiling.stage("jnc_correction"):
+            self._data = np.asarray(data) * 1000 + JNC_POT_MV
+
+        self.opt_pulse_width = file_data.opt_pulse_width
+        self.opt_pulse_isi = file_data.opt_pulse_isi
+        self.opt_pow = file_data.opt_pow
+        self.elec_power = elec_power
+        self.elec_thresh = elec_thresh
+        self.cell = cell
+
+        with profiling.stage("get_peaks"):
+            self.get_peaks()
+
+        with profiling.stage("metrics"):
+            (strength, phase) = self.get_vector_strength(file_data._times) # pylint: disable=protected-access
+            self.metrics = RunMetrics(
+                strength,
+                phase,
+                self._calculate_adaption_ratio(),
+                self.get_spike_ratio(),
+                self.get_frequency())
+
+    @property
+    def data(self) -> Sequence[q.UnitQuantity]:
+        """The membrane voltage (mV), corrected for junction potential"""
+        return q.Quantity(self._data, 'mV', copy=False)
+
+    def get_peaks(self):
+        """
+        Determines the data indices of peaks. Called by the constructor.
+
+        Returns detailed peak data
+        """
+        peak_data = PulseTrainRun.describe_peaks(self._data)
+        self.peaks = [x['peak'] for x in peak_data if x['superthresh']]
+        return peak_data
+
+    @staticmethod
+    def _find_onset(data: np.ndarray, thresh: float, peak: int) -> int:
+        """
+        Returns the last index at or before the peak where the data is below the
+        threshold, or 0 if there is none. Each run is a long trace with few peaks,
+        so walking back from each peak is much faster than searching the whole
+        trace (cf. sgn.peaks.find_last_idx)
+        """
+        idx = peak
+        while idx > 0:
+            if data[idx] < thresh:
+                return idx
+            idx -= 1
+
+        return 0
+
+    @staticmethod
+    def describe_peaks(
+            data: Sequence[float],
+            expected: int = None,
+            thresh: float = -20):
+        """
+        Calculates the time constants for peaks in the given signal (mV).
+
+        If expected is provided and a different number of peaks is found, raise an exception
+        """
+        data = np.asarray(data)
+        located = locate_peaks(data, thresh, 500, 0.33, 0.67, expected)
+        peaks = located.peaks
+
+        indices = [(int(x[0]), int(x[1])) for x in zip(located.left_ips, located.right_ips)]
+
+        # a peak is superthreshold if the derivative between its half maximum
+        # crossings exceeds the AP detection threshold
+        above_deriv_thresh = [
+            np.max(np.diff(data[x[0]:x[1]]) / PERIOD, initial=0) >= PulseTrainRun._ap_detection_threshold
+            for x in indices
+        ]
+        widths = [int(x[1] - x[0]) for x in indices]
+        maxes = [data[x] for x in peaks]
+
+        onsets = [PulseTrainRun._find_onset(data, thresh, pk) for pk in peaks]
+
+        return [{
+            "peak": x[0],
+            "max": x[1],
+            "fwhm": x[2],
+            "t_on": x[3],
+            "t_off": x[4],
+            "onset": x[5],
+            "superthresh": x[6]
+        } for x in zip(peaks, maxes, widths, located.on, located.off, onsets, above_deriv_thresh)]
+
+    def get_vector_strength(self, times):
+        """
+        Calculates the vector strength of this run
+
+        returns: (strength, phase)
+        """
+
+        period = self.opt_pulse_isi + self.opt_pulse_width
+        events = np.asarray(times)[self.peaks]
+        return vectorstrength(events, period)
+
+    def get_adaption_ratio(self):
+        """
+        Gets the ratio between the amplitude of the first peak
+        and the amplitude of the last peak, or 0 if <2 peaks are found
+        """
+        return self.metrics.adaption_ratio * q.dimensionless
+
+    def _calculate_adaption_ratio(self) -> float:
+        """Calculates the adaption ratio, see get_adaption_ratio"""
+        if len(self.peaks) < 2:
+            return 0.
+
+        baseline = np.mean(self._data[0:500])
+        return (self._data[self.peaks[-1]] - baseline) / (self._data[self.peaks[0]] - baseline)
+
+    def get_spike_ratio(self, num_stimuli=10):
+        """
+        Gets the proportion of spikes generated, assuming a default
+        of 10 pulses in the train.
+        """
+        return len(self.peaks) / num_stimuli
+
+    def get_frequency(self):
+        """Gets the freuqency of this stimulation run"""
+        return math.floor(1000. / (self.opt_pulse_isi + self.opt_pulse_width))
+
+    @staticmethod
+    def bucket(val, bucket):
+        """Converts a value into a bucketed value"""
+        return int(buckets(val, bucket))
+
+    def plot(
+            self,
+            times: Sequence[q.UnitTime],
+            start_idx: int,
+            end_idx: int,
+            include_peaks: bool,
+            ax: "matplotlib.axes.Axes" = None,
+            show_title: bool = True,
+            o_bucket: int = 10,
+            e_bucket: int = 5,
+            **kwargs
+    ):
+        """Plots the sequence, marking peaks if include_peaks is True"""
+        import matplotlib.pyplot as plt # pylint: disable=import-outside-toplevel
+        import seaborn as sns # pylint: disable=import-outside-toplevel
+
+        if ax is None:
+            __, ax = plt.subplots(1, 1)
+
+        ax.plot(times[start_idx:end_idx], self._data[start_idx:end_idx], **kwargs)
+
+        freq = self.get_frequency()
+
+        if include_peaks:
+            ax.scatter(
+                [times[i] for i in self.peaks if i >= start_idx and i <= end_idx],
+                [self._data[i] for i in self.peaks if i >= start_idx and i <= end_idx],
+                marker='+', color='r')
+
+        sns.despine(ax=ax)
+
+        ax.set_ylim((-75, 30))
+        ax.set_yticks([-75, -50, -25, 0, 25])
+        ax.set_xlabel("Time (sec)")
+        ax.set_ylabel("Membrane Voltage (mV)")
+        if show_title:
+            opow = self.opt_pow if o_bucket is None else \
+                PulseTrainRun.bucket(self.opt_pow, o_bucket)
+            epow = self.elec_power if e_bucket is None else \
+                PulseTrainRun.bucket(self.elec_power, e_bucket)
+
+            ax.set_title(
+                f"{freq} Hz\n{opow:.0f}% Optical \n{epow:.0f}% Electrical")
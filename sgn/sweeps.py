@@ -0,0 +1,56 @@
+r"""
+Streaming access to the sweeps recorded in an axograph file
+"""
+
+from typing import Iterator, List, Sequence, Tuple
+
+import axographio
+import numpy as np
+
+
+class SweepReader(object):
+    """
+    Reads the sweeps (data columns) of an axograph file one at a time.
+
+    The file is parsed by axographio, but the reader holds the only reference to
+    each column and releases it as soon as it has been yielded. Each sweep can
+    therefore be analysed (or copied) and freed before moving on to the next,
+    rather than the whole file staying in memory while it is processed.
+    """
+
+    names: List[str]
+    times: np.ndarray
+
+    _columns: list
+
+    def __init__(self, path: str, columns: Sequence[np.ndarray] = None, names: Sequence[str] = None):
+        """
+        Reads the axograph file at the given path. Alternatively the columns
+        (time first) and their names can be given directly, e.g. for synthetic
+        data, in which case the path is not read.
+        """
+        if columns is None:
+            axo = axographio.read(path) # pylint:ignore E1101
+            columns = axo.data
+            names = axo.names
+
+        self.names = list(names)
+        self._columns = list(columns)
+        self.times = self._columns[0]
+
+    def __len__(self):
+        """The number of columns in the file, including the time column"""
+        return len(self._columns)
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yields (column index, sweep) for each column after the time column,
+        releasing each column once it has been yielded. Can only be iterated once.
+        """
+        for idx in range(1, len(self._columns)):
+            sweep = self._columns[idx]
+            if sweep is None:
+                raise ValueError("Sweeps have already been read from this SweepReader")
+
+            self._columns[idx] = None
+            yield idx, sweep
@@ -0,0 +1,373 @@
+r"""
+contains time constants for a given costimulation run
+"""
+
+import math
+from typing import Dict, Sequence, Tuple
+
+from collections import namedtuple
+import numpy as np
+import quantities as q
+from scipy.signal import find_peaks, peak_widths
+
+from sgn import profiling
+from sgn.peaks import find_last_idx, find_width, locate_peaks
+
+DerivativeInfo = namedtuple('DerivativeInfo', 'idx_peak_start idx_peak idx_dvdt_thresh idx_dvdt_peak dvdt_peak dvdt_avg dvdt')
+
+# The fields of the structured array returned by TimeConstants.describe_batch. The
+# peak fields are those from describe_peaks for the first peak, and the derivative
+# fields are those of the DerivativeInfo from get_derivative.
+BATCH_DTYPE = np.dtype([
+    ("baseline", np.float64),
+    ("num_peaks", np.int64),
+    ("peak", np.int64),
+    ("max", np.float64),
+    ("fwhm", np.int64),
+    ("t_on", np.int64),
+    ("t_off", np.int64),
+    ("onset", np.int64),
+    ("0mv_duration", np.int64),
+    ("has_derivative", np.bool_),
+    ("idx_peak_start", np.int64),
+    ("idx_peak", np.int64),
+    ("idx_dvdt_thresh", np.int64),
+    ("idx_dvdt_peak", np.int64),
+    ("dvdt_peak", np.float64),
+    ("dvdt_avg", np.float64),
+])
+
+# the time constants when there is no peak, shared between instances
+_ZERO_TIME = 0 * q.second
+
+class TimeConstants(object):
+    """
+    A class to contain time constants for action potential data.
+    All time constants are in milliseconds
+    """
+
+    # There is one instance per stimulus per run, so rather than holding a
+    # quantity per time constant (~800 bytes each), the magnitudes are held as
+    # floats alongside the shared units, and converted back to quantities on access
+    __slots__ = (
+        "_onset_latency",
+        "_peak_latency",
+        "_fwhm_duration",
+        "_mv0_duration",
+        "_on_tau",
+        "_off_tau",
+        "_units",
+        "derivative",
+    )
+
+    # the units of the time constants, or None if the sample period was unitless
+    _units: q.dimensionality.Dimensionality
+    derivative: DerivativeInfo
+
+    def __init__(
+            self,
+            peak_data: Dict[str, float],
+            sample_period: q.millisecond,
+            stim_onset: int,
+            derivative_info: DerivativeInfo = None):
+        """
+        Initialises the array with peak data from CostimulationRun::describe_peaks
+        """
+
+        self.derivative = None
+
+        if peak_data is None:
+            self._units = _ZERO_TIME.dimensionality
+            self._onset_latency = _ZERO_TIME.magnitude
+            self._peak_latency = _ZERO_TIME.magnitude
+            self._fwhm_duration = _ZERO_TIME.magnitude
+            self._mv0_duration = _ZERO_TIME.magnitude
+            self._on_tau = _ZERO_TIME.magnitude
+            self._off_tau = _ZERO_TIME.magnitude
+            return
+
+        self.derivative = derivative_info
+
+        self._units = getattr(sample_period, "dimensionality", None)
+        sample_period = getattr(sample_period, "magnitude", sample_period)
+
+        # Onset latency is currently undefined - it is unclear what it should be?
+        # Should it count from optical or electrical start? What happens when the
+        # electrical pulse happens as the optical is already rising?
+        self._onset_latency = None
+        # (peak_data['onset'] - stim_onset) * sample_period * 1000
+
+        # i.e. the number of num_samples * seconds per sample in millis
+        self._peak_latency = (peak_data['peak'] - stim_onset) * sample_period * 1000
+        self._mv0_duration = peak_data['0mv_duration'] * sample_period * 1000
+        self._fwhm_duration = peak_data['fwhm'] * sample_period * 1000
+
+        self._on_tau = (peak_data['t_on'] - stim_onset) * sample_period * 1000
+        self._off_tau = (peak_data['t_off'] - peak_data['peak']) * sample_period * 1000
+
+    def _to_time(self, value: float) -> q.UnitTime:
+        """Converts a stored time constant magnitude back to a quantity"""
+        if self._units is None:
+            return value
+
+        return q.Quantity(value, self._units)
+
+    def magnitudes(self) -> Tuple[float, float, float, float, float, float]:
+        """
+        Gets the (onset_latency, peak_latency, mv0_duration, fwhm_duration, on_tau, off_tau)
+        magnitudes, without converting them to quantities
+        """
+        return (
+            -1 if self._onset_latency is None else self._onset_latency,
+            self._peak_latency,
+            self._mv0_duration,
+            self._fwhm_duration,
+            self._on_tau,
+            self._off_tau
+        )
+
+    @property
+    def onset_latency(self) -> q.UnitTime:
+        """The onset latency, currently undefined (-1 ms) where there is a peak"""
+        if self._onset_latency is None:
+            return q.Quantity(-1, 'ms')
+
+        return self._to_time(self._onset_latency)
+
+    @property
+    def peak_latency(self) -> q.UnitTime:
+        """The time from the stimulus onset to the peak"""
+        return self._to_time(self._peak_latency)
+
+    @property
+    def fwhm_duration(self) -> q.UnitTime:
+        """The full width of the peak at half its maximum"""
+        return self._to_time(self._fwhm_duration)
+
+    @property
+    def mv0_duration(self) -> q.UnitTime:
+        """The width of the peak at 0 mV"""
+        return self._to_time(self._mv0_duration)
+
+    @property
+    def on_tau(self) -> q.UnitTime:
+        """The on time constant, from the stimulus onset"""
+        return self._to_time(self._on_tau)
+
+    @property
+    def off_tau(self) -> q.UnitTime:
+        """The off time constant, from the peak"""
+        return self._to_time(self._off_tau)
+
+    @staticmethod
+    def from_batch(
+            description: np.void,
+            sample_period: q.millisecond,
+            stim_onset: int) -> "TimeConstants":
+        """
+        Creates the time constants from a single row of the output of describe_batch
+        """
+
+        peak_data = None
+        if description["num_peaks"] > 0:
+            peak_data = {
+                "peak": description["peak"],
+                "max": description["max"],
+                "fwhm": description["fwhm"],
+                "t_on": description["t_on"],
+                "t_off": description["t_off"],
+                "onset": description["onset"],
+                "0mv_duration": description["0mv_duration"]
+            }
+
+        derivative_info = None
+        if description["has_derivative"]:
+            derivative_info = DerivativeInfo(
+                description["idx_peak_start"],
+                description["idx_peak"],
+                description["idx_dvdt_thresh"],
+                description["idx_dvdt_peak"],
+                description["dvdt_peak"],
+                description["dvdt_avg"],
+                None
+            )
+
+        return TimeConstants(peak_data, sample_period, stim_onset, derivative_info)
+
+    @staticmethod
+    def __exp(x: float, a: float, inverse_tc: float, constant: float):
+        return a * np.exp(inverse_tc * x) + constant
+
+
+    @staticmethod
+    def describe_peaks(
+            data: Sequence[float],
+            expected: int = None,
+            deriv_thresh: float = 0.02):
+        """
+        Calculates the time constants for peaks in the given signal.
+
+        If expected is provided and a different number of peaks is found, raise an exception
+        """
+
+        baseline = data[:250].mean()
+        thresh = baseline - 0.03 * baseline
+
+        # t_on / t_off are where the peak is ~36.8% / ~63.2% down from the top
+        located = locate_peaks(data, thresh, 5000, 0.368, 0.632, expected)
+        peaks = located.peaks
+
+        widths = [int(x[0] - x[1]) for x in zip(located.right_ips, located.left_ips)]
+        maxes = [data[x] - baseline for x in peaks] # maximum is the delta to baseline
+
+        # below thresh and deriv above deriv_thresh. The data is compared at double
+        # precision so the result is the same as comparing each sample to thresh
+        diff = np.diff(data)
+        onsets = find_last_idx(
+            (np.asarray(data[:-1], dtype=np.float64) < thresh) & (diff > deriv_thresh),
+            peaks)
+
+        zero_durations = find_width(data[:-1], peaks, 0)
+
+        return [{
+            "peak": x[0],
+            "max": x[1],
+            "fwhm": x[2],
+            "t_on": x[3],
+            "t_off": x[4],
+            "onset": x[5],
+            "0mv_duration": x[6]
+        } for x in zip(peaks, maxes, widths, located.on, located.off, onsets, zero_durations)]
+
+    @staticmethod
+    def get_derivative(
+        data: Sequence[float],
+        period: float,
+        dvdt_threshold: float,
+        samples_to_ms: float,
+        include_dvdt: bool=False):
+        if np.max(data) < -0.02:
+            return None
+
+        (peaks, _) = find_peaks(data, distance=1000, width=50, height=1e-6)
+        widths = peak_widths(data, peaks, rel_height=0.95)
+
+        if len(peaks) != 1:
+            return None
+
+        peak_start_idx = int(widths[2])
+        peak_idx = peaks[0]
+
+        dvdt = [0] + (data[peak_start_idx:peak_idx]-data[peak_start_idx-1:peak_idx-1])/float(getattr(period, "magnitude", period))
+
+        if len(dvdt) == 0:
+            return None
+
+        (dvdt_peaks, _) = find_peaks(dvdt, width=6, height=25, rel_height=0.5)
+
+        for dvdt_idx in range(0, len(dvdt)):
+            if dvdt[dvdt_idx] > dvdt_threshold:
+                break
+
+        if peak_start_idx + dvdt_idx > peak_idx:
+            dvdt_idx = -1
+
+        dvdt_peak_idx = dvdt_peaks[0] if len(dvdt_peaks) > 0 else -1
+
+        return DerivativeInfo(
+            peak_start_idx,
+            peak_idx,
+            dvdt_idx,
+            dvdt_peak_idx,
+            dvdt[dvdt_peak_idx] if dvdt_peak_idx > 0 else -1,
+            1000*(data[peak_idx] - data[dvdt_idx + peak_start_idx])/(samples_to_ms * (peak_idx - (dvdt_idx + peak_start_idx))),
+            dvdt if include_dvdt else None
+        )
+
+    @staticmethod
+    def describe_batch(
+            data: np.ndarray,
+            period: q.millisecond,
+            dvdt_threshold: float,
+            samples_to_ms: float,
+            deriv_thresh: float = 0.02) -> np.ndarray:
+        """
+        Describes the first peak and the derivative of every row of the given
+        (runs x samples) data, e.g. the same stimulus window of every run in a file.
+        This gives the same result as calling describe_peaks and get_derivative
+        for each row, but the baselines, thresholds, derivatives, onsets and
+        0mV durations are calculated for all rows at once.
+
+        Returns a structured array with BATCH_DTYPE and one element per row. Rows
+        without a peak have num_peaks of 0 and rows where get_derivative would
+        return None have has_derivative False, in which case the remaining fields
+        are -1. The result can be passed directly to pd.DataFrame.
+        """
+
+        data = np.atleast_2d(data)
+        result = np.full(len(data), -1, dtype=BATCH_DTYPE)
+        result["num_peaks"] = 0
+        result["has_derivative"] = False
+
+        with profiling.stage("describe_peaks"):
+            baseline = data[:, :250].mean(axis=1)
+            thresh = baseline - 0.03 * baseline
+            result["baseline"] = baseline
+
+            for i, row in enumerate(data):
+                peaks, peak_data = find_peaks(row, distance=5000, height=thresh[i], width=50)
+                result["num_peaks"][i] = len(peaks)
+
+                if len(peaks) == 0:
+                    continue
+
+                peaks = peaks[:1]
+                result["peak"][i] = peaks[0]
+                result["max"][i] = row[peaks[0]] - baseline[i]
+                result["fwhm"][i] = int(peak_data['right_ips'][0] - peak_data['left_ips'][0])
+                result["t_on"][i] = math.ceil(peak_widths(row, peaks, rel_height=0.368)[2][0])
+                result["t_off"][i] = math.ceil(peak_widths(row, peaks, rel_height=0.632)[3][0])
+
+            diff = np.diff(data, axis=1)
+            rows = np.flatnonzero(result["num_peaks"] > 0)
+            peaks = result["peak"][rows]
+
+            result["onset"][rows] = find_last_idx(
+                (np.asarray(data[:, :-1], dtype=np.float64) < thresh[:, None]) & (diff > deriv_thresh),
+                peaks,
+                rows)
+            result["0mv_duration"][rows] = find_width(data[:, :-1], peaks, 0, rows)
+
+        with profiling.stage("get_derivative"):
+            # get_derivative, only rows with a maximum above the peak height can have a peak
+            for i in np.flatnonzero(np.max(data, axis=1) >= 1e-6):
+                row = data[i]
+                (peaks, _) = find_peaks(row, distance=1000, width=50, height=1e-6)
+
+                if len(peaks) != 1:
+                    continue
+
+                peak_start_idx = int(peak_widths(row, peaks, rel_height=0.95)[2][0])
+                peak_idx = peaks[0]
+
+                dvdt = diff[i, peak_start_idx - 1:peak_idx - 1] / float(getattr(period, "magnitude", period))
+                if len(dvdt) == 0:
+                    continue
+
+                (dvdt_peaks, _) = find_peaks(dvdt, width=6, height=25, rel_height=0.5)
+
+                # the first index above the threshold, or the last index if there isn't one
+                above = dvdt > dvdt_threshold
+                dvdt_idx = np.argmax(above) if above.any() else len(dvdt) - 1
+                dvdt_peak_idx = dvdt_peaks[0] if len(dvdt_peaks) > 0 else -1
+
+                result["has_derivative"][i] = True
+                result["idx_peak_start"][i] = peak_start_idx
+                result["idx_peak"][i] = peak_idx
+                result["idx_dvdt_thresh"][i] = dvdt_idx
+                result["idx_dvdt_peak"][i] = dvdt_peak_idx
+                result["dvdt_peak"][i] = dvdt[dvdt_peak_idx] if dvdt_peak_idx > 0 else -1
+                result["dvdt_avg"][i] = 1000*(row[peak_idx] - row[dvdt_idx + peak_start_idx]) / \
+                    (samples_to_ms * (peak_idx - (dvdt_idx + peak_start_idx)))
+
+        return result
@@ -0,0 +1,12 @@
+r"""
+Makes the shared sgn package and the costimulation scripts importable when
+running pytest from any directory
+"""
+
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.path.join(ROOT_DIR, "scripts"))
+sys.path.insert(0, ROOT_DIR)
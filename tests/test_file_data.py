@@ -0,0 +1,37 @@
+r"""
+Checks that the costimulation FileData analyses files without any runs
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("axographio")
+
+# pylint: disable=wrong-import-position
+from file_data import FileData
+from sgn.sweeps import SweepReader
+
+# a manifest row for protocol 1, whose stimuli are within the first 100000 samples
+META = ["empty.axgd", 1, 1700, 1750, 135, 150, True, 4400, 0]
+
+
+def _empty_sweeps():
+    """An axograph file with only the time column"""
+    return SweepReader("empty.axgd", [np.arange(100000) * 2e-5], ["Time (s)"])
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_empty_file(lazy):
+    data = FileData(META, lazy=lazy, sweeps=_empty_sweeps())
+
+    assert data.runs == []
+    assert not data.any_aps
+    assert len(data.to_df()) == 0
+
+
+def test_empty_file_memory_mapped(tmp_path):
+    data = FileData(META, str(tmp_path), sweeps=_empty_sweeps())
+
+    assert data.runs == []
+    assert data._traces_path is None # pylint: disable=protected-access
+    assert not list(tmp_path.iterdir())
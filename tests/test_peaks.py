@@ -0,0 +1,125 @@
+r"""
+Checks the vectorised onset and 0 mV width searches in sgn.peaks against the
+walking loops they replaced in TimeConstants.describe_peaks
+"""
+
+import numpy as np
+import pytest
+
+from sgn.peaks import find_last_idx, find_width
+
+
+def _loop_last_idx(mask, start_idx):
+    """The original TimeConstants.__find_last_idx, with the comparator applied to a mask"""
+    idx = start_idx
+    while idx > 0:
+        if mask[idx]:
+            return idx
+        idx -= 1
+
+    return 0
+
+
+def _loop_width(data, start_idx, level):
+    """The original TimeConstants.__find_width"""
+    start = start_idx
+    end = start_idx
+    delta = 0
+    max_val = len(data)
+
+    while start_idx - delta > 0:
+        if start_idx + delta < max_val and end == start_idx:
+            if data[start_idx + delta] < level:
+                end = start_idx + delta
+
+        if start == start_idx and data[start_idx - delta] < level:
+            start = start_idx - delta
+
+        if start != start_idx and end != start_idx:
+            return end - start
+
+        delta = delta + 1
+
+    return -1
+
+
+def _trace(seed, samples=2000):
+    """A noisy resting trace (V) with a few AP-like peaks crossing 0 V"""
+    random = np.random.RandomState(seed)
+    data = -0.065 + 0.002 * random.standard_normal(samples)
+    times = np.arange(samples)
+    for centre in random.randint(50, samples - 50, size=4):
+        data += 0.1 * np.exp(-0.5 * ((times - centre) / random.uniform(3, 30)) ** 2)
+
+    return data
+
+
+def _peaks(data):
+    """Peak indices to test: both ends of the trace, some local maxima and points above 0 V"""
+    local_max = np.flatnonzero((data[1:-1] > data[:-2]) & (data[1:-1] >= data[2:])) + 1
+    above = np.flatnonzero(data > 0)
+    return np.unique(np.concatenate([[0, 1, len(data) - 2, len(data) - 1], local_max[::7], above[::3]]))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_find_last_idx_matches_loop(seed):
+    data = _trace(seed)
+    diff = np.diff(data)
+    mask = (data[:-1] < -0.0585) & (diff > 0.0005)
+    peaks = _peaks(data[:-1])
+
+    expected = [_loop_last_idx(mask, x) for x in peaks]
+    np.testing.assert_array_equal(find_last_idx(mask, peaks), expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_find_width_matches_loop(seed):
+    data = _trace(seed)[:-1]
+    peaks = _peaks(data)
+
+    expected = [_loop_width(data, x, 0) for x in peaks]
+    np.testing.assert_array_equal(find_width(data, peaks, 0), expected)
+
+
+def test_batch_rows_match_loop():
+    data = np.stack([_trace(x) for x in range(4)])[:, :-1]
+    rows = np.repeat(np.arange(4), 3)
+    peaks = np.array([x for row in data for x in _peaks(row)[1:4]])
+    mask = data < -0.0585
+
+    np.testing.assert_array_equal(
+        find_last_idx(mask, peaks, rows),
+        [_loop_last_idx(mask[r], p) for r, p in zip(rows, peaks)])
+    np.testing.assert_array_equal(
+        find_width(data, peaks, 0, rows),
+        [_loop_width(data[r], p, 0) for r, p in zip(rows, peaks)])
+
+
+def test_no_crossing():
+    data = _trace(0)[:-1]
+    peaks = _peaks(data)
+
+    # nothing is below -1 V, and everything is below 1 V so no peak rises above it
+    np.testing.assert_array_equal(find_last_idx(np.zeros(len(data), dtype=bool), peaks), 0)
+    np.testing.assert_array_equal(find_width(data, peaks, -1), -1)
+    np.testing.assert_array_equal(
+        find_width(data, peaks, 1), [_loop_width(data, x, 1) for x in peaks])
+
+
+def test_flat_trace():
+    data = np.full(500, -0.065)
+    peaks = np.array([0, 1, 250, 498, 499])
+
+    for level in (-0.07, -0.065, 0):
+        np.testing.assert_array_equal(
+            find_width(data, peaks, level), [_loop_width(data, x, level) for x in peaks])
+
+    mask = data < -0.06
+    np.testing.assert_array_equal(
+        find_last_idx(mask, peaks), [_loop_last_idx(mask, x) for x in peaks])
+
+
+def test_no_peaks():
+    data = _trace(0)
+    assert len(find_last_idx(data < 0, [])) == 0
+    assert len(find_width(data, [], 0)) == 0